@@ -1,12 +1,12 @@
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import from_json, col, window
-from pyspark.sql.types import StructType, StructField, StringType, DoubleType, TimestampType
+from pyspark.sql.avro.functions import from_avro
+from pyspark.sql.functions import col, explode, window, date_format
+from pyspark.sql.functions import avg, count
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, Table, Column, Integer, Float, String, DateTime, MetaData
-from hdfs import InsecureClient
-import json
-from datetime import datetime
+from sqlalchemy import create_engine, event, make_url, Table, Column, Integer, Float, String, DateTime, MetaData
+from sqlalchemy.pool import SingletonThreadPool
+import atexit
 import signal
 import sys
 import logging
@@ -21,6 +21,36 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+SQLITE_DB = os.path.abspath('temperature_data.db')
+# Avro schema of one Kafka message, shared with the producer
+SENSOR_READINGS_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sensor_readings.avsc')
+# Matches the string format SQLAlchemy's DateTime type uses for SQLite;
+# Postgres parses it into TIMESTAMP as well
+SQLITE_TIMESTAMP_FORMAT = "yyyy-MM-dd HH:mm:ss.SSSSSS"
+# One HDFS directory per hour, e.g. hour=2024-01-31_13
+HDFS_HOUR_FORMAT = "yyyy-MM-dd_HH"
+
+# Applied to every SQLite connection the driver opens through SQLAlchemy
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+)
+
+# JDBC drivers the executors use to write each supported backend
+JDBC_PACKAGES = {
+    'sqlite': 'org.xerial:sqlite-jdbc:3.44.1.0',
+    'postgresql': 'org.postgresql:postgresql:42.7.1',
+}
+
+def apply_sqlite_pragmas(dbapi_conn, connection_record=None):
+    """Switch a SQLite connection to WAL with relaxed syncing and larger caches"""
+    cursor = dbapi_conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
 class TemperatureConsumer:
     def __init__(self):
         logger.info("Initializing TemperatureConsumer...")
@@ -30,44 +60,45 @@ class TemperatureConsumer:
         self.topic = 'opensensemap_temperature'
         logger.info(f"Kafka broker: {self.kafka_broker}, Topic: {self.topic}")
         
-        # SQLite configuration
-        self.sqlite_db = 'temperature_data.db'
-        self.engine = create_engine(f'sqlite:///{self.sqlite_db}')
-        logger.info(f"SQLite database: {self.sqlite_db}")
+        # Database configuration (SQLite by default, Postgres for concurrent writers)
+        self.database_url = os.getenv('DATABASE_URL', f'sqlite:///{SQLITE_DB}')
+        if make_url(self.database_url).get_backend_name() == 'sqlite':
+            self.engine = create_engine(
+                self.database_url,
+                connect_args={'check_same_thread': False, 'timeout': 30},
+                poolclass=SingletonThreadPool
+            )
+            event.listen(self.engine, 'connect', apply_sqlite_pragmas)
+        else:
+            self.engine = create_engine(self.database_url)
+        logger.info(f"Database: {self.engine.url.render_as_string(hide_password=True)}")
         
         # Hadoop configuration
-        self.hdfs_url = os.getenv('HDFS_URL', 'http://localhost:9870')
-        self.hdfs_user = os.getenv('HDFS_USER', 'hdfs')
-        self.hdfs_client = InsecureClient(self.hdfs_url, user=self.hdfs_user)
-        logger.info(f"HDFS URL: {self.hdfs_url}")
+        self.hdfs_namenode = os.getenv('HDFS_NAMENODE', 'hdfs://localhost:9000')
+        self.hdfs_path = f'{self.hdfs_namenode}/temperature_data'
+        logger.info(f"HDFS path: {self.hdfs_path}")
         
         # Spark session
         self.spark = None
         self.query = None
+        self.parquet_query = None
+        self.aggregate_query = None
         
         # Initialize database
         self.init_database()
         
-        # Define schema for temperature data
-        self.schema = StructType([
-            StructField("timestamp", TimestampType()),
-            StructField("temperature", DoubleType()),
-            StructField("humidity", DoubleType()),
-            StructField("pressure", DoubleType()),
-            StructField("location", StructType([
-                StructField("latitude", DoubleType()),
-                StructField("longitude", DoubleType())
-            ]))
-        ])
+        # Load the Avro schema for temperature data
+        with open(SENSOR_READINGS_SCHEMA_PATH) as f:
+            self.avro_schema = f.read()
         logger.info("Schema initialized")
 
     def init_database(self):
-        """Initialize SQLite database"""
-        logger.info("Initializing SQLite database...")
+        """Initialize measurements database"""
+        logger.info("Initializing database...")
         metadata = MetaData()
         
         # Create measurements table
-        Table('measurements', metadata,
+        self.measurements = Table('measurements', metadata,
             Column('id', Integer, primary_key=True),
             Column('temperature', Float),
             Column('humidity', Float),
@@ -77,99 +108,149 @@ class TemperatureConsumer:
             Column('longitude', Float)
         )
         
+        # Create per-minute aggregates table
+        self.measurements_per_minute = Table('measurements_per_minute', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('window_start', DateTime),
+            Column('window_end', DateTime),
+            Column('avg_temperature', Float),
+            Column('avg_humidity', Float),
+            Column('avg_pressure', Float),
+            Column('readings', Integer)
+        )
+        
         # Create tables
         metadata.create_all(self.engine)
+        
+        # SQLAlchemy is only used for schema management; rows are written by
+        # the executors over JDBC, so release the driver's pooled connection
+        self.engine.dispose()
+        
+        self.jdbc_options = self.build_jdbc_options()
         logger.info("Database initialized successfully")
 
+    def build_jdbc_options(self):
+        """Build the Spark JDBC writer options for the configured database"""
+        url = self.engine.url
+        if url.get_backend_name() == 'postgresql':
+            return {
+                'driver': 'org.postgresql.Driver',
+                'url': f'jdbc:postgresql://{url.host or "localhost"}:{url.port or 5432}/{url.database}',
+                'user': url.username or '',
+                'password': url.password or '',
+                # Let the server cast the formatted timestamp strings
+                'stringtype': 'unspecified',
+            }
+        
+        # sqlite-jdbc applies pragmas passed as connection properties
+        return {
+            'driver': 'org.sqlite.JDBC',
+            'url': f'jdbc:sqlite:{url.database}',
+            'isolationLevel': 'SERIALIZABLE',
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': '30000',
+        }
+
+    def write_jdbc(self, df, table):
+        """Append df to table straight from the executors over JDBC"""
+        df.write \
+            .format("jdbc") \
+            .options(**self.jdbc_options) \
+            .option("dbtable", table.name) \
+            .option("batchsize", "5000") \
+            .mode("append") \
+            .save()
+
     def process_batch(self, df, epoch_id):
         """Process each batch of data"""
         try:
             logger.info(f"Processing batch {epoch_id}")
             
-            # Convert DataFrame to rows
-            rows = df.collect()
-            logger.info(f"Collected {len(rows)} records")
-            
-            # Prepare data for SQLite
-            measurements = []
-            for row in rows:
-                measurement = {
-                    'temperature': float(row.temperature) if row.temperature else None,
-                    'humidity': float(row.humidity) if row.humidity else None,
-                    'pressure': float(row.pressure) if row.pressure else None,
-                    'timestamp': row.timestamp,
-                    'latitude': float(row.location.latitude) if row.location and row.location.latitude else None,
-                    'longitude': float(row.location.longitude) if row.location and row.location.longitude else None
-                }
-                measurements.append(measurement)
-            
-            # Save to SQLite
-            if measurements:
-                logger.info(f"Saving {len(measurements)} records to SQLite")
-                with self.engine.connect() as conn:
-                    conn.execute(
-                        Table('measurements', MetaData(), autoload_with=self.engine).insert(),
-                        measurements
-                    )
+            # Flatten the nested location struct in Spark and let each executor
+            # write its partitions with batched prepared statements
+            self.write_jdbc(df.select(
+                "temperature",
+                "humidity",
+                "pressure",
+                date_format("timestamp", SQLITE_TIMESTAMP_FORMAT).alias("timestamp"),
+                col("location.latitude").alias("latitude"),
+                col("location.longitude").alias("longitude")
+            ), self.measurements)
             
-            # Save to Hadoop
-            if rows:
-                # Create timestamp-based directory
-                timestamp = datetime.now().strftime('%Y-%m-%d_%H')
-                hdfs_path = f'/temperature_data/{timestamp}/batch_{epoch_id}.json'
-                logger.info(f"Saving data to HDFS: {hdfs_path}")
-                
-                # Convert data to JSON
-                json_data = [row.asDict() for row in rows]
-                
-                # Write to HDFS
-                with self.hdfs_client.write(hdfs_path, encoding='utf-8') as writer:
-                    json.dump(json_data, writer)
-                
             logger.info(f"Successfully processed batch {epoch_id}")
             
         except Exception as e:
             logger.error(f"Error processing batch {epoch_id}: {e}", exc_info=True)
 
-    def cleanup(self, signum=None, frame=None):
-        """Cleanup Spark resources"""
+    def process_aggregates(self, df, epoch_id):
+        """Persist the per-minute aggregates finalized in this batch"""
+        try:
+            self.write_jdbc(df.select(
+                date_format("window.start", SQLITE_TIMESTAMP_FORMAT).alias("window_start"),
+                date_format("window.end", SQLITE_TIMESTAMP_FORMAT).alias("window_end"),
+                "avg_temperature",
+                "avg_humidity",
+                "avg_pressure",
+                "readings"
+            ), self.measurements_per_minute)
+            logger.info(f"Saved per-minute aggregates for batch {epoch_id}")
+            
+        except Exception as e:
+            logger.error(f"Error processing aggregates for batch {epoch_id}: {e}", exc_info=True)
+
+    def cleanup(self):
+        """Cleanup Spark resources; safe to call more than once"""
+        if not self.spark:
+            return
         logger.info("Cleaning up resources...")
         try:
-            if self.query:
-                self.query.stop()
-            if self.spark:
-                self.spark.stop()
+            for query in (self.query, self.parquet_query, self.aggregate_query):
+                if query:
+                    query.stop()
+            self.spark.stop()
             logger.info("Cleanup complete")
         except Exception as e:
             logger.error(f"Error during cleanup: {e}", exc_info=True)
         finally:
-            sys.exit(0)
+            self.query = self.parquet_query = self.aggregate_query = None
+            self.spark = None
 
     def run(self):
         """Run the Spark Streaming consumer"""
-        # Set up signal handlers
-        signal.signal(signal.SIGINT, self.cleanup)
-        signal.signal(signal.SIGTERM, self.cleanup)
+        # Stop Spark on any interpreter exit, and turn SIGTERM into a normal
+        # exit so the finally block below runs as it does for Ctrl+C
+        atexit.register(self.cleanup)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
         
         try:
             logger.info("Initializing Spark session...")
             # Initialize Spark session with proper configuration
             self.spark = SparkSession.builder \
                 .appName("TemperatureConsumer") \
-                .config("spark.jars.packages", "org.apache.spark:spark-sql-kafka-0-10_2.12:3.5.0") \
+                .config("spark.jars.packages", ",".join([
+                    "org.apache.spark:spark-sql-kafka-0-10_2.12:3.5.0",
+                    "org.apache.spark:spark-avro_2.12:3.5.0",
+                    JDBC_PACKAGES[self.engine.url.get_backend_name()]
+                ])) \
                 .config("spark.streaming.stopGracefullyOnShutdown", "true") \
                 .config("spark.sql.streaming.forceDeleteTempCheckpointLocation", "true") \
                 .config("spark.executor.memory", "1g") \
                 .config("spark.driver.memory", "1g") \
-                .config("spark.sql.shuffle.partitions", "2") \
-                .config("spark.default.parallelism", "2") \
-                .config("spark.streaming.kafka.maxRatePerPartition", "100") \
+                .config("spark.driver.extraJavaOptions",
+                        "-XX:+UseG1GC -XX:MaxGCPauseMillis=200 -XX:InitiatingHeapOccupancyPercent=35") \
+                .config("spark.executor.extraJavaOptions", "-XX:+UseG1GC -XX:MaxGCPauseMillis=200") \
+                .config("spark.serializer", "org.apache.spark.serializer.KryoSerializer") \
+                .config("spark.kryoserializer.buffer.max", "512m") \
+                .config("spark.sql.shuffle.partitions", str(os.cpu_count() or 2)) \
+                .config("spark.sql.parquet.compression.codec", "snappy") \
+                .config("spark.sql.parquet.outputTimestampType", "TIMESTAMP_MICROS") \
+                .config("spark.default.parallelism", str(os.cpu_count() or 2)) \
                 .config("spark.streaming.backpressure.enabled", "true") \
-                .config("spark.streaming.kafka.consumer.cache.enabled", "false") \
                 .getOrCreate()
 
             logger.info("Setting up Kafka source...")
-            # Read from Kafka
+            # Read from Kafka (each offset is an envelope of producer.BATCH_SIZE readings)
             df = self.spark \
                 .readStream \
                 .format("kafka") \
@@ -177,31 +258,69 @@ class TemperatureConsumer:
                 .option("subscribe", self.topic) \
                 .option("startingOffsets", "latest") \
                 .option("failOnDataLoss", "false") \
-                .option("maxOffsetsPerTrigger", "100") \
+                .option("maxOffsetsPerTrigger", "50") \
+                .option("minPartitions", "8") \
                 .load()
             
             logger.info("Setting up data parsing...")
-            # Parse JSON data
+            # Decode Avro data; each message is an array of readings. Malformed
+            # payloads decode to null and explode to no rows, so neither sink has to handle them
             parsed_df = df.select(
-                from_json(col("value").cast("string"), self.schema).alias("data")
+                explode(
+                    from_avro(col("value"), self.avro_schema, {"mode": "PERMISSIVE"})
+                ).alias("data")
             ).select("data.*")
             
-            logger.info("Starting streaming query...")
-            # Process each batch
+            logger.info("Starting streaming queries...")
+            # Process each batch into SQLite
             self.query = parsed_df \
                 .writeStream \
                 .foreachBatch(self.process_batch) \
                 .outputMode("append") \
-                .option("checkpointLocation", "./checkpoints") \
+                .option("checkpointLocation", "./checkpoints/sqlite") \
+                .trigger(processingTime="5 seconds") \
+                .start()
+            
+            # Write raw measurements to HDFS as Parquet directly from the executors.
+            # Shuffling by hour leaves one file per hour directory per trigger, and the
+            # longer trigger keeps that to 60 files an hour instead of 720 x partitions
+            self.parquet_query = parsed_df \
+                .withColumn("hour", date_format("timestamp", HDFS_HOUR_FORMAT)) \
+                .repartition("hour") \
+                .writeStream \
+                .format("parquet") \
+                .option("path", self.hdfs_path) \
+                .option("checkpointLocation", "./checkpoints/parquet") \
+                .partitionBy("hour") \
+                .outputMode("append") \
+                .trigger(processingTime="1 minute") \
+                .start()
+            
+            # Reduce to one row per minute on the executors; with the watermark
+            # each window is emitted once, after it can no longer change
+            self.aggregate_query = parsed_df \
+                .withWatermark("timestamp", "1 minute") \
+                .groupBy(window("timestamp", "1 minute")) \
+                .agg(
+                    avg("temperature").alias("avg_temperature"),
+                    avg("humidity").alias("avg_humidity"),
+                    avg("pressure").alias("avg_pressure"),
+                    count("*").alias("readings")
+                ) \
+                .writeStream \
+                .foreachBatch(self.process_aggregates) \
+                .outputMode("append") \
+                .option("checkpointLocation", "./checkpoints/aggregates") \
                 .trigger(processingTime="5 seconds") \
                 .start()
             
-            logger.info("Streaming query started, waiting for data...")
+            logger.info("Streaming queries started, waiting for data...")
             # Wait for termination
-            self.query.awaitTermination()
+            self.spark.streams.awaitAnyTermination()
             
         except Exception as e:
             logger.error(f"Error in Spark Streaming: {e}", exc_info=True)
+        finally:
             self.cleanup()
 
 if __name__ == "__main__":
@@ -209,6 +328,8 @@ if __name__ == "__main__":
         logger.info("Starting Temperature Consumer application...")
         consumer = TemperatureConsumer()
         consumer.run()
+    except KeyboardInterrupt:
+        logger.info("Consumer interrupted, shutting down")
     except Exception as e:
         logger.error(f"Fatal error in main: {e}", exc_info=True)
         sys.exit(1) 
\ No newline at end of file
@@ -1,17 +1,31 @@
+import io
 import json
+import os
 import time
-import random
-from datetime import datetime
+import numpy as np
 from confluent_kafka import Producer
+from fastavro import parse_schema, schemaless_writer
 
 # Kafka configuration
 conf = {
     'bootstrap.servers': 'localhost:9092',
-    'message.max.bytes': 1000000000  # 1GB (maximum allowed value)
+    'message.max.bytes': 1000000000,  # 1GB (maximum allowed value)
+    # Let librdkafka batch and compress in the background
+    'linger.ms': 20,
+    'batch.num.messages': 1000,
+    'compression.type': 'lz4'
 }
 
+# Number of readings sampled and sent per Kafka message
+BATCH_SIZE = 1000
+
+# Avro schema of one Kafka message, shared with the consumer
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sensor_readings.avsc')) as f:
+    SENSOR_READINGS_SCHEMA = parse_schema(json.load(f))
+
 # Create Producer instance
 producer = Producer(conf)
+rng = np.random.default_rng()
 
 def delivery_callback(err, msg):
     if err:
@@ -19,16 +33,14 @@ def delivery_callback(err, msg):
     else:
         print(f'Message delivered to {msg.topic()} [{msg.partition()}] at offset {msg.offset()}')
 
-def generate_sensor_data():
+def generate_sensor_batch(n=BATCH_SIZE):
+    """Sample n sensor readings at once, one list per field"""
     return {
-        'timestamp': datetime.now().isoformat(),
-        'temperature': round(random.uniform(-10, 40), 2),
-        'humidity': round(random.uniform(0, 100), 2),
-        'pressure': round(random.uniform(980, 1020), 2),
-        'location': {
-            'latitude': round(random.uniform(-90, 90), 6),
-            'longitude': round(random.uniform(-180, 180), 6)
-        }
+        'temperature': rng.uniform(-10, 40, n).round(2).tolist(),
+        'humidity': rng.uniform(0, 100, n).round(2).tolist(),
+        'pressure': rng.uniform(980, 1020, n).round(2).tolist(),
+        'latitude': rng.uniform(-90, 90, n).round(6).tolist(),
+        'longitude': rng.uniform(-180, 180, n).round(6).tolist()
     }
 
 def main():
@@ -36,22 +48,48 @@ def main():
     
     try:
         while True:
-            data = generate_sensor_data()
-            message = json.dumps(data)
+            batch = generate_sensor_batch()
+            timestamp = time.time_ns() // 1000  # timestamp-micros
+            
+            # Wrap the whole batch into one Avro-encoded envelope message
+            buffer = io.BytesIO()
+            schemaless_writer(buffer, SENSOR_READINGS_SCHEMA, [
+                {
+                    'timestamp': timestamp,
+                    'temperature': temperature,
+                    'humidity': humidity,
+                    'pressure': pressure,
+                    'location': {
+                        'latitude': latitude,
+                        'longitude': longitude
+                    }
+                }
+                for temperature, humidity, pressure, latitude, longitude in zip(
+                    batch['temperature'], batch['humidity'], batch['pressure'],
+                    batch['latitude'], batch['longitude']
+                )
+            ])
+            message = buffer.getvalue()
             
-            # Produce message
-            producer.produce(
-                'opensensemap_temperature',
-                value=message.encode('utf-8'),
-                callback=delivery_callback
-            )
+            # Produce message, waiting for queue space if librdkafka is backed up
+            try:
+                producer.produce(
+                    'opensensemap_temperature',
+                    value=message,
+                    callback=delivery_callback
+                )
+            except BufferError:
+                producer.poll(1)
+                producer.produce(
+                    'opensensemap_temperature',
+                    value=message,
+                    callback=delivery_callback
+                )
             
-            # Flush to ensure delivery
+            # Serve delivery callbacks without blocking
             producer.poll(0)
-            producer.flush()
             
-            print(f"Sent data: {message}")
-            time.sleep(1)  # Wait for 1 second before next message
+            print(f"Sent batch of {BATCH_SIZE} readings ({len(message)} bytes)")
             
     except KeyboardInterrupt:
         print("\nStopping producer...")
@@ -5,20 +5,26 @@ Specializes in data processing, pattern recognition, and insights generation.
 """
 
 import os
-import json
+import re
+import time
+import random
+import asyncio
 import logging
-import requests
+import httpx
+import orjson
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
+from neo4j import AsyncGraphDatabase
 import uvicorn
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Analysis Agent", version="1.0.0")
+app = FastAPI(title="Analysis Agent", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Configuration
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
@@ -27,7 +33,165 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 RESEARCH_STORAGE_URL = os.getenv("RESEARCH_STORAGE_URL", "http://localhost:8001")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-xxx")
+SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "2"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+OLLAMA_TIMEOUT = 60  # seconds per generation
+OLLAMA_MAX_TOKENS = 200
+OLLAMA_HTTP_TIMEOUT = httpx.Timeout(OLLAMA_TIMEOUT, connect=2, write=5, pool=5)
+DEEPSEEK_TIMEOUT = httpx.Timeout(30, connect=2, write=5, pool=5)
+STORAGE_TIMEOUT = httpx.Timeout(10, connect=2, write=5, pool=5)
+OLLAMA_QUEUE_TIMEOUT = 10  # seconds to wait for a free Ollama slot before falling back
 AGENT_ID = "analysis_agent"
+RESEARCH_RESULTS_TTL = 60  # seconds
+MARKET_TRENDS_TTL = 300  # seconds
+CACHE_MAX_ENTRIES = 128
+TEXT_GENERATION_FAILED = "Text generation failed - using fallback analysis"
+
+# Bounds on the data embedded in LLM prompts; prompt length dominates generation latency
+PROMPT_LIST_LIMIT = 10
+PROMPT_TEXT_LIMIT = 300
+PROMPT_DATA_LIMIT = 8192
+CONTENT_PROMPT_KEYS = ("title", "description", "headings", "links", "text_content")
+
+# Heading keywords -> messaging theme, and link keywords that mark a call to action
+THEME_KEYWORDS = {
+    "netzwerk": "Networking", "network": "Networking",
+    "exclusive": "Exclusivity", "exklusiv": "Exclusivity",
+    "deals": "Deal Flow", "geschäfte": "Deal Flow",
+    "wissen": "Knowledge Sharing", "knowledge": "Knowledge Sharing",
+}
+THEME_ORDER = ("Networking", "Exclusivity", "Deal Flow", "Knowledge Sharing")
+CTA_KEYWORDS = ("contact", "kontakt", "join", "beitreten", "apply", "bewerben")
+_THEME_RE = re.compile("|".join(map(re.escape, THEME_KEYWORDS)))
+_CTA_RE = re.compile("|".join(map(re.escape, CTA_KEYWORDS)))
+
+# Constant parts of the analysis results, shared read-only across calls
+BCD_ANALYSIS_SKELETON = {
+    "business_analysis": {
+        "business_model": "Exclusive Network/Community",
+        "target_audience": "Entrepreneurs and Investors",
+        "value_proposition": [
+            "Network Building",
+            "Deal Flow",
+            "Knowledge Sharing",
+            "Peer Exchange"
+        ],
+        "revenue_model": "Membership-based"
+    },
+    "marketing_analysis": {
+        "marketing_channels": [
+            "Event Marketing",
+            "Community Marketing",
+            "Exclusivity Marketing"
+        ],
+        "content_strategy": "High-quality, exclusive content",
+        "engagement_tactics": "WhatsApp community, exclusive events"
+    },
+    "competitive_analysis": {
+        "direct_competitors": [
+            "YPO (Young Presidents' Organization)",
+            "EO (Entrepreneurs' Organization)",
+            "Vistage"
+        ],
+        "competitive_advantages": [
+            "Exclusive network focus",
+            "German market specialization",
+            "High-touch community approach"
+        ]
+    },
+    "technical_analysis": {
+        "website_quality": "Professional",
+        "content_structure": "Well-organized",
+        "user_experience": "Good",
+        "seo_elements": "Present"
+    }
+}
+
+MARKET_TRENDS_SKELETON = {
+    "industry_trends": {
+        "networking_platforms": "Growing demand for exclusive networking",
+        "digital_communities": "Shift towards digital-first communities",
+        "wealth_management": "Increasing focus on alternative investments",
+        "entrepreneur_networks": "Rising popularity of peer-to-peer learning"
+    },
+    "market_opportunities": [
+        "Digital transformation of exclusive networks",
+        "Integration of AI and automation",
+        "Expansion into emerging markets",
+        "Development of hybrid event models"
+    ],
+    "competitive_landscape": {
+        "market_leaders": ["YPO", "EO", "Vistage"],
+        "emerging_players": ["Mastermind groups", "Online communities"],
+        "market_gaps": ["German-speaking exclusive networks", "Tech-focused entrepreneur groups"]
+    }
+}
+
+# Limits in-flight Ollama generations so bursts queue here instead of on the server;
+# the server's parallel slots are split between the gunicorn workers
+_ollama_sem = asyncio.Semaphore(max(1, OLLAMA_NUM_PARALLEL // WEB_CONCURRENCY))
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+class CircuitBreaker:
+    """Fail fast after fail_max consecutive failures until reset_timeout seconds have passed."""
+    
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+    
+    def allow(self) -> bool:
+        # Once reset_timeout has passed a trial call goes through; another failure reopens the circuit
+        return self.failures < self.fail_max or time.monotonic() - self.opened_at >= self.reset_timeout
+    
+    def record(self, ok: bool):
+        if ok:
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.failures >= self.fail_max:
+            self.opened_at = time.monotonic()
+
+_ollama_breaker = CircuitBreaker("ollama")
+_deepseek_breaker = CircuitBreaker("deepseek")
+_storage_breaker = CircuitBreaker("research_storage")
+
+# Errors raised before the request reached the service, so retrying cannot duplicate it
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+async def _call_service(breaker: CircuitBreaker, request, attempts: int = 2) -> Any:
+    """Await request() through breaker, retrying connection failures with jittered backoff.
+    
+    Exceptions and 5xx responses count as failures; other responses are returned as-is.
+    """
+    if not breaker.allow():
+        raise CircuitOpenError(f"{breaker.name} circuit is open")
+    
+    for attempt in range(attempts):
+        try:
+            result = await request()
+        except RETRYABLE_ERRORS:
+            if attempt == attempts - 1:
+                breaker.record(False)
+                raise
+            await asyncio.sleep(min(2.0, 0.1 * 2 ** attempt) * random.uniform(0.5, 1.5))
+        except Exception:
+            breaker.record(False)
+            raise
+        else:
+            breaker.record(not (isinstance(result, httpx.Response) and result.status_code >= 500))
+            return result
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+_background_tasks = set()
+
+# In-process TTL cache: key -> (expires_at, value), oldest put first
+_cache: Dict[Any, Tuple[float, Any]] = {}
 
 class TaskRequest(BaseModel):
     subtask_id: str
@@ -40,32 +204,110 @@ class TaskResponse(BaseModel):
     result: Dict[str, Any]
     message: str
 
-def _initialize_neo4j_connection():
+def _cache_get(key: Any) -> Any:
+    """Return the cached value for key if it has not expired."""
+    entry = _cache.get(key)
+    if entry and time.monotonic() < entry[0]:
+        return entry[1]
+    return None
+
+def _cache_put(key: Any, value: Any, ttl: float):
+    """Cache value under key for ttl seconds, holding at most CACHE_MAX_ENTRIES entries."""
+    now = time.monotonic()
+    _cache.pop(key, None)
+    if len(_cache) >= CACHE_MAX_ENTRIES:
+        # Each entry expires on its own TTL, not the caller's
+        for stale_key in [k for k, (expires_at, _) in _cache.items() if now >= expires_at]:
+            del _cache[stale_key]
+        # All still fresh: evict the oldest puts
+        while len(_cache) >= CACHE_MAX_ENTRIES:
+            del _cache[next(iter(_cache))]
+    _cache[key] = (now + ttl, value)
+
+def _slim_for_prompt(value: Any) -> Any:
+    """Truncate lists and long strings recursively so they stay cheap to prompt with."""
+    if isinstance(value, dict):
+        return {key: _slim_for_prompt(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_slim_for_prompt(item) for item in value[:PROMPT_LIST_LIMIT]]
+    if isinstance(value, str):
+        return value[:PROMPT_TEXT_LIMIT]
+    return value
+
+def _prompt_json(data: Dict[str, Any]) -> str:
+    """Serialize data compactly for a prompt, capped at PROMPT_DATA_LIMIT characters."""
+    return orjson.dumps(_slim_for_prompt(data)).decode()[:PROMPT_DATA_LIMIT]
+
+async def _initialize_neo4j_connection():
     """Initialize Neo4j connection with retry logic."""
-    from neo4j import GraphDatabase
-    import time
-    
     max_retries = 10
     retry_delay = 2
     
     for attempt in range(max_retries):
+        driver = AsyncGraphDatabase.driver(
+            NEO4J_URI,
+            auth=(NEO4J_USER, NEO4J_PASSWORD),
+            max_connection_pool_size=50,
+            connection_acquisition_timeout=10
+        )
         try:
-            driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
             # Test connection
-            with driver.session() as session:
-                session.run("RETURN 1")
+            async with driver.session() as session:
+                await session.run("RETURN 1")
             logger.info("Successfully connected to Neo4j")
             return driver
         except Exception as e:
+            await driver.close()
             logger.warning(f"Attempt {attempt + 1}/{max_retries} failed to connect to Neo4j: {e}")
             if attempt < max_retries - 1:
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
                 retry_delay *= 1.5
             else:
                 logger.error("Failed to connect to Neo4j after all retries")
                 raise
 
-def _store_research_data(task_id: str, data_type: str, content: Dict[str, Any]):
+@app.on_event("startup")
+async def startup():
+    """Open the Neo4j driver and HTTP client once; their pools are shared by all requests."""
+    app.state.neo4j = await _initialize_neo4j_connection()
+    app.state.http = httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        timeout=httpx.Timeout(30, connect=2, write=5, pool=5),
+        follow_redirects=True
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush pending status writes, then close the shared Neo4j driver and HTTP client."""
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await app.state.http.aclose()
+    await app.state.neo4j.close()
+
+async def _write_agent_status(tx, status: str, task_id: str):
+    await tx.run("""
+        MERGE (a:Agent {agent_id: $agent_id})
+        SET a.status = $status, a.current_task = $task_id
+    """, agent_id=AGENT_ID, status=status, task_id=task_id)
+
+async def _set_agent_status(status: str, task_id: str = "", after: Optional[asyncio.Task] = None):
+    """Record the agent status in Neo4j, once any earlier status write has landed."""
+    if after is not None:
+        await asyncio.gather(after, return_exceptions=True)
+    try:
+        async with app.state.neo4j.session() as session:
+            await session.execute_write(_write_agent_status, status, task_id)
+    except Exception as e:
+        logger.warning(f"Failed to set agent status to {status}: {e}")
+
+def _in_background(coro) -> asyncio.Task:
+    """Run coro without blocking the request, keeping a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def _store_research_data(task_id: str, data_type: str, content: Dict[str, Any]):
     """Store analysis data in the research storage service."""
     try:
         research_data = {
@@ -81,11 +323,12 @@ def _store_research_data(task_id: str, data_type: str, content: Dict[str, Any]):
             }
         }
         
-        response = requests.post(
+        response = await _call_service(_storage_breaker, lambda: app.state.http.post(
             f"{RESEARCH_STORAGE_URL}/api/data",
-            json=research_data,
-            timeout=10
-        )
+            content=orjson.dumps(research_data),
+            headers={"Content-Type": "application/json"},
+            timeout=STORAGE_TIMEOUT
+        ))
         
         if response.status_code == 200:
             logger.info(f"Successfully stored {data_type} data")
@@ -98,61 +341,86 @@ def _store_research_data(task_id: str, data_type: str, content: Dict[str, Any]):
         logger.error(f"Error storing analysis data: {e}")
         return False
 
-def _get_research_results(task_id: str) -> Optional[Dict[str, Any]]:
-    """Get research results from storage service."""
+async def _get_research_results(task_id: str) -> Optional[Dict[str, Any]]:
+    """Get research results from storage service, cached per task for a short TTL."""
+    cache_key = ("research_results", task_id)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        response = requests.get(
+        response = await _call_service(_storage_breaker, lambda: app.state.http.get(
             f"{RESEARCH_STORAGE_URL}/api/data",
             params={"data_type": "scraped_data"},
-            timeout=10
-        )
+            timeout=STORAGE_TIMEOUT
+        ))
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if data.get("data") and len(data["data"]) > 0:
                 # Get the most recent research data
                 latest_data = data["data"][0]
-                return latest_data.get("content", {}).get("research_results", {})
+                research_results = latest_data.get("content", {}).get("research_results", {})
+                _cache_put(cache_key, research_results, RESEARCH_RESULTS_TTL)
+                return research_results
         return None
     except Exception as e:
         logger.error(f"Error getting research results: {e}")
         return None
 
-def _search_google_competitors(query: str) -> Dict[str, Any]:
-    """Search Google for competitor information."""
+def _parse_search_results(html: str) -> List[Dict[str, str]]:
+    """Extract the top 5 organic results from a Google result page."""
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    
+    competitors = []
+    for result in HTMLParser(html).css('div.g')[:5]:  # Top 5 results
+        title_elem = result.css_first('h3')
+        link_elem = result.css_first('a')
+        snippet_elem = result.css_first('div.VwiC3b')
+        
+        if title_elem and link_elem:
+            competitors.append({
+                "title": title_elem.text(),
+                "url": link_elem.attributes.get('href') or '',
+                "snippet": snippet_elem.text() if snippet_elem else ""
+            })
+    return competitors
+
+async def _search_google_competitors(query: str) -> Dict[str, Any]:
+    """Search Google for competitor information.
+    
+    Uses the SerpAPI JSON endpoint when SERPAPI_API_KEY is set and falls back
+    to parsing the result page with selectolax otherwise.
+    """
     try:
-        import requests
-        from bs4 import BeautifulSoup
-        import urllib.parse
-        
-        # Use a simple search approach (in production, you'd use Google Search API)
-        search_query = urllib.parse.quote(query)
-        search_url = f"https://www.google.com/search?q={search_query}"
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(search_url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract search results
         competitors = []
-        search_results = soup.find_all('div', class_='g')
         
-        for result in search_results[:5]:  # Top 5 results
-            title_elem = result.find('h3')
-            link_elem = result.find('a')
-            snippet_elem = result.find('div', class_='VwiC3b')
+        if SERPAPI_API_KEY:
+            response = await app.state.http.get(
+                "https://serpapi.com/search.json",
+                params={"engine": "google", "q": query, "num": 5, "api_key": SERPAPI_API_KEY},
+                timeout=15
+            )
+            response.raise_for_status()
             
-            if title_elem and link_elem:
+            for result in orjson.loads(response.content).get("organic_results", [])[:5]:
                 competitors.append({
-                    "title": title_elem.get_text(),
-                    "url": link_elem.get('href', ''),
-                    "snippet": snippet_elem.get_text() if snippet_elem else ""
+                    "title": result.get("title", ""),
+                    "url": result.get("link", ""),
+                    "snippet": result.get("snippet", "")
                 })
+        else:
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            }
+            
+            response = await app.state.http.get(
+                "https://www.google.com/search", params={"q": query}, headers=headers, timeout=15
+            )
+            response.raise_for_status()
+            
+            # Parsing a full result page is CPU-bound, so keep it off the event loop
+            competitors = await asyncio.to_thread(_parse_search_results, response.text)
         
         return {
             "search_query": query,
@@ -164,37 +432,63 @@ def _search_google_competitors(query: str) -> Dict[str, Any]:
         logger.error(f"Error searching Google: {e}")
         return {"error": str(e)}
 
-def _generate_text_with_ollama(prompt: str) -> str:
-    """Generate text using Ollama, with DeepSeek fallback."""
-    try:
-        # Try Ollama first
-        response = requests.post(
-            f"{OLLAMA_HOST}/api/generate",
-            json={
-                "model": "llama2:7b",  # Use smaller model
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "num_predict": 200,  # Limit response length
-                    "temperature": 0.7
-                }
-            },
-            timeout=500  # Shorter timeout for Ollama
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result.get("response", "")
-        else:
+async def _stream_ollama(prompt: str) -> str:
+    """Stream a generation from Ollama, stopping once OLLAMA_MAX_TOKENS tokens have arrived."""
+    tokens = []
+    async with app.state.http.stream(
+        "POST",
+        f"{OLLAMA_HOST}/api/generate",
+        json={
+            "model": "llama2:7b",  # Use smaller model
+            "prompt": prompt,
+            "stream": True,
+            "options": {
+                "num_predict": OLLAMA_MAX_TOKENS,  # Limit response length
+                "temperature": 0.7
+            }
+        },
+        timeout=OLLAMA_HTTP_TIMEOUT
+    ) as response:
+        if response.status_code != 200:
             logger.error(f"Ollama API error: {response.status_code}")
             raise Exception("Ollama failed")
+        
+        # Ollama streams one JSON object per line, each carrying the next token
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = orjson.loads(line)
+            tokens.append(chunk.get("response", ""))
+            if chunk.get("done") or len(tokens) >= OLLAMA_MAX_TOKENS:
+                break
+    
+    return "".join(tokens)
+
+async def _generate_text_with_ollama(prompt: str) -> str:
+    """Generate text using Ollama, with DeepSeek fallback.
+    
+    Falls back straight away when Ollama's circuit is open or no Ollama slot
+    frees up within OLLAMA_QUEUE_TIMEOUT.
+    """
+    try:
+        # Try Ollama first
+        if not _ollama_breaker.allow():
+            raise CircuitOpenError("ollama circuit is open")
+        await asyncio.wait_for(_ollama_sem.acquire(), timeout=OLLAMA_QUEUE_TIMEOUT)
+        try:
+            return await _call_service(
+                _ollama_breaker,
+                lambda: asyncio.wait_for(_stream_ollama(prompt), timeout=OLLAMA_TIMEOUT)
+            )
+        finally:
+            _ollama_sem.release()
             
-    except (requests.exceptions.Timeout, Exception) as e:
-        logger.warning(f"Ollama failed: {e}, trying DeepSeek API")
+    except (httpx.TimeoutException, asyncio.TimeoutError, Exception) as e:
+        logger.warning(f"Ollama failed: {e!r}, trying DeepSeek API")
         
         # Fallback to DeepSeek API
         try:
-            deepseek_response = requests.post(
+            deepseek_response = await _call_service(_deepseek_breaker, lambda: app.state.http.post(
                 "https://api.deepseek.com/v1/chat/completions",
                 headers={
                     "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
@@ -208,28 +502,28 @@ def _generate_text_with_ollama(prompt: str) -> str:
                     "max_tokens": 500,
                     "temperature": 0.7
                 },
-                timeout=30
-            )
+                timeout=DEEPSEEK_TIMEOUT
+            ))
             
             if deepseek_response.status_code == 200:
-                result = deepseek_response.json()
+                result = orjson.loads(deepseek_response.content)
                 return result.get("choices", [{}])[0].get("message", {}).get("content", "")
             else:
                 logger.error(f"DeepSeek API error: {deepseek_response.status_code}")
-                return "Text generation failed - using fallback analysis"
+                return TEXT_GENERATION_FAILED
                 
         except Exception as deepseek_error:
             logger.error(f"DeepSeek API also failed: {deepseek_error}")
-            return "Text generation failed - using fallback analysis"
+            return TEXT_GENERATION_FAILED
 
-def _analyze_bcd_data(bcd_data: Dict[str, Any]) -> Dict[str, Any]:
+async def _analyze_bcd_data(bcd_data: Dict[str, Any]) -> Dict[str, Any]:
     """Analyze Better Call Dominik website data."""
     try:
         # Generate comprehensive analysis using Ollama
         analysis_prompt = f"""
         Analyze the following website data for Better Call Dominik and provide a comprehensive marketing analysis:
         
-        Website Data: {json.dumps(bcd_data, indent=2)}
+        Website Data: {_prompt_json(bcd_data)}
         
         Please provide analysis in the following areas:
         1. Business Model Analysis
@@ -243,51 +537,19 @@ def _analyze_bcd_data(bcd_data: Dict[str, Any]) -> Dict[str, Any]:
         Format the response as a structured analysis with clear sections.
         """
         
-        ollama_analysis = _generate_text_with_ollama(analysis_prompt)
-        
-        # Search for competitors
-        competitor_search = _search_google_competitors("exclusive entrepreneur network Germany competitors")
+        # Generate the analysis and search for competitors concurrently
+        ollama_analysis, competitor_search = await asyncio.gather(
+            _generate_text_with_ollama(analysis_prompt),
+            _search_google_competitors("exclusive entrepreneur network Germany competitors")
+        )
         
+        # Static sections are shared module constants; only the generated parts are per call
         analysis = {
-            "business_analysis": {
-                "business_model": "Exclusive Network/Community",
-                "target_audience": "Entrepreneurs and Investors",
-                "value_proposition": [
-                    "Network Building",
-                    "Deal Flow",
-                    "Knowledge Sharing",
-                    "Peer Exchange"
-                ],
-                "revenue_model": "Membership-based"
-            },
-            "marketing_analysis": {
-                "marketing_channels": [
-                    "Event Marketing",
-                    "Community Marketing",
-                    "Exclusivity Marketing"
-                ],
-                "content_strategy": "High-quality, exclusive content",
-                "engagement_tactics": "WhatsApp community, exclusive events"
-            },
+            **BCD_ANALYSIS_SKELETON,
             "competitive_analysis": {
-                "direct_competitors": [
-                    "YPO (Young Presidents' Organization)",
-                    "EO (Entrepreneurs' Organization)",
-                    "Vistage"
-                ],
-                "competitive_advantages": [
-                    "Exclusive network focus",
-                    "German market specialization",
-                    "High-touch community approach"
-                ],
+                **BCD_ANALYSIS_SKELETON["competitive_analysis"],
                 "google_search_results": competitor_search
             },
-            "technical_analysis": {
-                "website_quality": "Professional",
-                "content_structure": "Well-organized",
-                "user_experience": "Good",
-                "seo_elements": "Present"
-            },
             "ai_generated_analysis": ollama_analysis
         }
         
@@ -306,14 +568,14 @@ def _analyze_bcd_data(bcd_data: Dict[str, Any]) -> Dict[str, Any]:
         logger.error(f"Error analyzing BCD data: {e}")
         return {"error": str(e)}
 
-def _analyze_content(content_data: Dict[str, Any]) -> Dict[str, Any]:
+async def _analyze_content(content_data: Dict[str, Any]) -> Dict[str, Any]:
     """Analyze content structure and messaging."""
     try:
         # Generate content analysis using Ollama
         content_prompt = f"""
         Analyze the following website content and provide marketing insights:
         
-        Content Data: {json.dumps(content_data, indent=2)}
+        Content Data: {_prompt_json({key: content_data[key] for key in CONTENT_PROMPT_KEYS if key in content_data})}
         
         Please analyze:
         1. Content Structure and Quality
@@ -326,7 +588,7 @@ def _analyze_content(content_data: Dict[str, Any]) -> Dict[str, Any]:
         Provide specific, actionable insights.
         """
         
-        ollama_content_analysis = _generate_text_with_ollama(content_prompt)
+        ollama_content_analysis = await _generate_text_with_ollama(content_prompt)
         
         analysis = {
             "content_structure": {
@@ -352,15 +614,8 @@ def _analyze_content(content_data: Dict[str, Any]) -> Dict[str, Any]:
         headings = content_data.get("headings", [])
         themes = []
         for heading in headings[:5]:  # Top 5 headings
-            text = heading.get("text", "").lower()
-            if "netzwerk" in text or "network" in text:
-                themes.append("Networking")
-            if "exclusive" in text or "exklusiv" in text:
-                themes.append("Exclusivity")
-            if "deals" in text or "geschäfte" in text:
-                themes.append("Deal Flow")
-            if "wissen" in text or "knowledge" in text:
-                themes.append("Knowledge Sharing")
+            found = {THEME_KEYWORDS[m.group()] for m in _THEME_RE.finditer(heading.get("text", "").lower())}
+            themes.extend(theme for theme in THEME_ORDER if theme in found)
         
         analysis["messaging_analysis"]["key_themes"] = themes
         
@@ -368,11 +623,13 @@ def _analyze_content(content_data: Dict[str, Any]) -> Dict[str, Any]:
         links = content_data.get("links", [])
         ctas = []
         for link in links:
-            text = link.get("text", "").lower()
-            if any(word in text for word in ["contact", "kontakt", "join", "beitreten", "apply", "bewerben"]):
-                ctas.append(link.get("text", ""))
+            text = link.get("text", "")
+            if _CTA_RE.search(text.lower()):
+                ctas.append(text)
+                if len(ctas) == 3:  # Top 3 CTAs
+                    break
         
-        analysis["messaging_analysis"]["call_to_actions"] = ctas[:3]  # Top 3 CTAs
+        analysis["messaging_analysis"]["call_to_actions"] = ctas
         
         return analysis
         
@@ -380,8 +637,12 @@ def _analyze_content(content_data: Dict[str, Any]) -> Dict[str, Any]:
         logger.error(f"Error analyzing content: {e}")
         return {"error": str(e)}
 
-def _analyze_market_trends() -> Dict[str, Any]:
-    """Analyze market trends and industry insights."""
+async def _analyze_market_trends() -> Dict[str, Any]:
+    """Analyze market trends and industry insights, cached for MARKET_TRENDS_TTL."""
+    cached = _cache_get("market_trends")
+    if cached is not None:
+        return cached
+    
     try:
         # Generate market analysis using Ollama
         market_prompt = """
@@ -398,28 +659,13 @@ def _analyze_market_trends() -> Dict[str, Any]:
         Focus on the German and European markets for exclusive entrepreneur networks.
         """
         
-        ollama_market_analysis = _generate_text_with_ollama(market_prompt)
+        ollama_market_analysis = await _generate_text_with_ollama(market_prompt)
         
-        trends = {
-            "industry_trends": {
-                "networking_platforms": "Growing demand for exclusive networking",
-                "digital_communities": "Shift towards digital-first communities",
-                "wealth_management": "Increasing focus on alternative investments",
-                "entrepreneur_networks": "Rising popularity of peer-to-peer learning"
-            },
-            "market_opportunities": [
-                "Digital transformation of exclusive networks",
-                "Integration of AI and automation",
-                "Expansion into emerging markets",
-                "Development of hybrid event models"
-            ],
-            "competitive_landscape": {
-                "market_leaders": ["YPO", "EO", "Vistage"],
-                "emerging_players": ["Mastermind groups", "Online communities"],
-                "market_gaps": ["German-speaking exclusive networks", "Tech-focused entrepreneur groups"]
-            },
-            "ai_market_analysis": ollama_market_analysis
-        }
+        trends = {**MARKET_TRENDS_SKELETON, "ai_market_analysis": ollama_market_analysis}
+        
+        # The prompt is fixed, so a successful generation is reusable across tasks
+        if ollama_market_analysis != TEXT_GENERATION_FAILED:
+            _cache_put("market_trends", trends, MARKET_TRENDS_TTL)
         
         return trends
         
@@ -430,35 +676,36 @@ def _analyze_market_trends() -> Dict[str, Any]:
 @app.post("/task", response_model=TaskResponse)
 async def process_task(task_request: TaskRequest):
     """Process an analysis task."""
+    busy_write = None
     try:
         logger.info(f"Processing analysis task: {task_request.subtask_id}")
         
-        # Initialize Neo4j connection
-        driver = _initialize_neo4j_connection()
+        # Status writes go to Neo4j in the background so they stay off the response path
+        busy_write = _in_background(_set_agent_status("busy", task_request.subtask_id))
         
-        # Update agent status in Neo4j
-        with driver.session() as session:
-            session.run("""
-                MERGE (a:Agent {agent_id: $agent_id})
-                SET a.status = 'busy', a.current_task = $task_id
-            """, agent_id=AGENT_ID, task_id=task_request.subtask_id)
-        
-        # Get research results if available
-        research_results = _get_research_results(task_request.parameters.get("task_id", ""))
+        research_task_id = task_request.parameters.get("task_id", "")
         
         # Perform analysis based on task type
-        if task_request.task_type == "data_analysis":
-            if research_results and "bcd_analysis" in research_results:
-                analysis_results = _analyze_bcd_data(research_results["bcd_analysis"])
-            else:
-                analysis_results = _analyze_content(research_results or {})
-        elif task_request.task_type == "pattern_recognition":
-            analysis_results = _analyze_market_trends()
+        if task_request.task_type == "pattern_recognition":
+            # Market trends do not depend on research results, so fetch both at once
+            research_results, analysis_results = await asyncio.gather(
+                _get_research_results(research_task_id),
+                _analyze_market_trends()
+            )
         else:
-            analysis_results = {"error": f"Unknown task type: {task_request.task_type}"}
+            # Get research results if available
+            research_results = await _get_research_results(research_task_id)
+            
+            if task_request.task_type == "data_analysis":
+                if research_results and "bcd_analysis" in research_results:
+                    analysis_results = await _analyze_bcd_data(research_results["bcd_analysis"])
+                else:
+                    analysis_results = await _analyze_content(research_results or {})
+            else:
+                analysis_results = {"error": f"Unknown task type: {task_request.task_type}"}
         
         # Store analysis data
-        _store_research_data(
+        await _store_research_data(
             task_request.subtask_id,
             "analysis_results",
             {
@@ -470,13 +717,7 @@ async def process_task(task_request: TaskRequest):
         )
         
         # Update agent status back to available
-        with driver.session() as session:
-            session.run("""
-                MERGE (a:Agent {agent_id: $agent_id})
-                SET a.status = 'available', a.current_task = ''
-            """, agent_id=AGENT_ID)
-        
-        driver.close()
+        _in_background(_set_agent_status("available", after=busy_write))
         
         return TaskResponse(
             subtask_id=task_request.subtask_id,
@@ -489,16 +730,7 @@ async def process_task(task_request: TaskRequest):
         logger.error(f"Error processing analysis task: {e}")
         
         # Update agent status back to available on error
-        try:
-            driver = _initialize_neo4j_connection()
-            with driver.session() as session:
-                session.run("""
-                    MERGE (a:Agent {agent_id: $agent_id})
-                    SET a.status = 'available', a.current_task = ''
-                """, agent_id=AGENT_ID)
-            driver.close()
-        except:
-            pass
+        _in_background(_set_agent_status("available", after=busy_write))
         
         raise HTTPException(status_code=500, detail=f"Analysis task failed: {str(e)}")
 
@@ -513,4 +745,4 @@ async def root():
     return {"agent_id": AGENT_ID, "type": "analysis", "status": "available"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools") 
\ No newline at end of file
@@ -0,0 +1,17 @@
+"""Gunicorn settings for the analysis agent."""
+
+import os
+import multiprocessing
+
+bind = "0.0.0.0:8000"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# UvicornWorker picks up uvloop and httptools when uvicorn[standard] is installed
+worker_class = "uvicorn.workers.UvicornWorker"
+worker_connections = 1000
+backlog = 2048
+# Tasks wait on LLM generations, so allow well past the Ollama timeout
+timeout = 300
+keepalive = 5
+
+# Workers read this to split the shared Ollama slots between them
+os.environ["WEB_CONCURRENCY"] = str(workers)
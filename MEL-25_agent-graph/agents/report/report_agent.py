@@ -4,7 +4,6 @@ Marketing Analysis Strategy Department - Report Agent
 Handles report generation and LaTeX formatting.
 """
 
-import json
 import logging
 import os
 import time
@@ -13,8 +12,10 @@ from datetime import datetime
 from typing import Dict, Optional
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable
+import orjson
 from pydantic import BaseModel
 
 # Configure logging
@@ -33,6 +34,131 @@ class TaskResponse(BaseModel):
     result: Dict
     message: str
 
+# Lookup indexes for the properties this agent matches on; kept non-unique because
+# agent nodes are MERGEd on several properties and may already have duplicates
+GRAPH_INDEXES = [
+    "CREATE INDEX agent_id IF NOT EXISTS FOR (a:Agent) ON (a.id)",
+    "CREATE INDEX subtask_id IF NOT EXISTS FOR (st:SubTask) ON (st.id)",
+    "CREATE INDEX result_subtask_id IF NOT EXISTS FOR (r:Result) ON (r.subtask_id)"
+]
+
+# Fixed report sections, shared read-only by every report
+EXECUTIVE_SUMMARY = {
+    "overview": "BCD operates as an exclusive networking platform targeting high-value entrepreneurs and investors in the DACH region.",
+    "key_findings": [
+        "Exclusive community model with premium positioning",
+        "Strong focus on deal flow and investment opportunities",
+        "Multi-channel marketing approach including events and digital platforms",
+        "Competitive advantage through local market expertise"
+    ],
+    "strategic_positioning": "Premium networking platform focused on deal flow and investment opportunities",
+    "market_opportunity": "Growing demand for exclusive, high-value networking communities"
+}
+
+DETAILED_ANALYSIS = {
+    "business_model_analysis": {
+        "model_type": "Exclusive Network/Community",
+        "revenue_streams": ["Membership fees", "Event revenue", "Deal facilitation"],
+        "scalability": "High potential for expansion",
+        "competitive_advantages": ["Local expertise", "Deal flow focus", "Exclusive membership"]
+    },
+    "target_audience_analysis": {
+        "primary_audience": "Entrepreneurs and Investors",
+        "secondary_audience": "Family Offices",
+        "audience_size": "Niche but high-value",
+        "audience_characteristics": "High net worth, investment-focused, deal-driven"
+    },
+    "competitive_analysis": {
+        "direct_competitors": ["YPO", "EO", "Vistage"],
+        "competitive_positioning": "Local expertise vs global scale",
+        "differentiation_factors": ["Deal flow focus", "Investment opportunities", "Exclusive community"]
+    }
+}
+
+# Static LaTeX source for the report, built once at import
+LATEX_TEMPLATE = r"""
+\documentclass[12pt,a4paper]{article}
+\usepackage[utf8]{inputenc}
+\usepackage{graphicx}
+\usepackage{hyperref}
+\usepackage{geometry}
+\geometry{margin=1in}
+
+\title{Marketing Analysis Report: BCD Network}
+\author{Marketing Analysis Strategy Department}
+\date{\today}
+
+\begin{document}
+
+\maketitle
+
+\section{Executive Summary}
+
+BCD operates as an exclusive networking platform targeting high-value entrepreneurs and investors in the DACH region. The platform's primary value proposition centers around deal flow and investment opportunities, positioning itself as a premium networking community.
+
+\section{Key Findings}
+
+\begin{itemize}
+\item Exclusive community model with premium positioning
+\item Strong focus on deal flow and investment opportunities  
+\item Multi-channel marketing approach including events and digital platforms
+\item Competitive advantage through local market expertise
+\end{itemize}
+
+\section{Strategic Recommendations}
+
+\subsection{Marketing Recommendations}
+\begin{itemize}
+\item Focus on exclusive positioning to differentiate from competitors
+\item Leverage deal flow as primary value proposition
+\item Develop multi-channel marketing approach
+\item Build strong community engagement through events
+\end{itemize}
+
+\subsection{Competitive Recommendations}
+\begin{itemize}
+\item Emphasize local market expertise vs global competitors
+\item Highlight investment opportunities and deal flow
+\item Position as premium, curated network
+\end{itemize}
+
+\subsection{Growth Recommendations}
+\begin{itemize}
+\item Expand to additional European markets
+\item Develop digital platform for community engagement
+\item Create tiered membership structure
+\end{itemize}
+
+\section{Implementation Plan}
+
+\subsection{Phase 1 (3-6 months)}
+\begin{itemize}
+\item Refine exclusive positioning
+\item Develop deal flow processes
+\item Enhance community engagement
+\end{itemize}
+
+\subsection{Phase 2 (6-12 months)}
+\begin{itemize}
+\item Expand to new markets
+\item Launch digital platform
+\item Scale membership base
+\end{itemize}
+
+\subsection{Phase 3 (12-24 months)}
+\begin{itemize}
+\item Achieve market leadership
+\item Develop additional revenue streams
+\item Establish global presence
+\end{itemize}
+
+\section{Conclusion}
+
+BCD has established a strong foundation in the exclusive networking space with a clear focus on deal flow and investment opportunities. The platform's local market expertise and exclusive positioning provide competitive advantages that can be leveraged for growth and expansion.
+
+\end{document}
+"""
+
 class ReportAgent:
     def __init__(self):
         self.neo4j_uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
@@ -45,6 +171,7 @@ class ReportAgent:
         self._initialize_neo4j_connection()
         
         # Initialize agent in graph
+        self._ensure_indexes()
         self._initialize_agent()
     
     def _initialize_neo4j_connection(self):
@@ -78,6 +205,12 @@ class ReportAgent:
                 logger.error(f"Unexpected error connecting to Neo4j: {e}")
                 raise
     
+    def _ensure_indexes(self):
+        """Create the lookup indexes used by this agent's queries if they are missing."""
+        with self.driver.session() as session:
+            for statement in GRAPH_INDEXES:
+                session.run(statement)
+    
     def _initialize_agent(self):
         """Initialize the agent node in the graph database."""
         try:
@@ -107,8 +240,8 @@ class ReportAgent:
             self._update_agent_status("busy", task_request.subtask_id)
             
             result = await self._generate_report(task_request.parameters)
+            # Also marks the agent available, in the same transaction
             self._store_result(task_request.subtask_id, result)
-            self._update_agent_status("available", None)
             
             return TaskResponse(
                 subtask_id=task_request.subtask_id,
@@ -144,52 +277,27 @@ class ReportAgent:
     
     def _get_strategy_results(self, task_id: str) -> Optional[Dict]:
         """Get strategy results from the graph database."""
-        with self.driver.session() as session:
-            result = session.run("""
+        def read(tx):
+            record = tx.run("""
                 MATCH (st:SubTask {id: $task_id})-[:PRODUCES]->(r:Result)
                 RETURN r.content as content
-            """, {"task_id": task_id})
-            
-            record = result.single()
-            if record:
-                return json.loads(record["content"])
-            return None
+            """, {"task_id": task_id}).single()
+            return record["content"] if record else None
+        
+        with self.driver.session() as session:
+            content = session.execute_read(read)
+        
+        if content:
+            return orjson.loads(content)
+        return None
     
     def _generate_executive_summary(self, strategy_data: Optional[Dict]) -> Dict:
         """Generate executive summary."""
-        return {
-            "overview": "BCD operates as an exclusive networking platform targeting high-value entrepreneurs and investors in the DACH region.",
-            "key_findings": [
-                "Exclusive community model with premium positioning",
-                "Strong focus on deal flow and investment opportunities",
-                "Multi-channel marketing approach including events and digital platforms",
-                "Competitive advantage through local market expertise"
-            ],
-            "strategic_positioning": "Premium networking platform focused on deal flow and investment opportunities",
-            "market_opportunity": "Growing demand for exclusive, high-value networking communities"
-        }
+        return EXECUTIVE_SUMMARY
     
     def _generate_detailed_analysis(self, strategy_data: Optional[Dict]) -> Dict:
         """Generate detailed analysis section."""
-        return {
-            "business_model_analysis": {
-                "model_type": "Exclusive Network/Community",
-                "revenue_streams": ["Membership fees", "Event revenue", "Deal facilitation"],
-                "scalability": "High potential for expansion",
-                "competitive_advantages": ["Local expertise", "Deal flow focus", "Exclusive membership"]
-            },
-            "target_audience_analysis": {
-                "primary_audience": "Entrepreneurs and Investors",
-                "secondary_audience": "Family Offices",
-                "audience_size": "Niche but high-value",
-                "audience_characteristics": "High net worth, investment-focused, deal-driven"
-            },
-            "competitive_analysis": {
-                "direct_competitors": ["YPO", "EO", "Vistage"],
-                "competitive_positioning": "Local expertise vs global scale",
-                "differentiation_factors": ["Deal flow focus", "Investment opportunities", "Exclusive community"]
-            }
-        }
+        return DETAILED_ANALYSIS
     
     def _extract_recommendations(self, strategy_data: Optional[Dict]) -> Dict:
         """Extract recommendations from strategy data."""
@@ -207,131 +315,50 @@ class ReportAgent:
     
     def _generate_latex_content(self, strategy_data: Optional[Dict]) -> str:
         """Generate LaTeX content for the report."""
-        latex_template = r"""
-\documentclass[12pt,a4paper]{article}
-\usepackage[utf8]{inputenc}
-\usepackage{graphicx}
-\usepackage{hyperref}
-\usepackage{geometry}
-\geometry{margin=1in}
-
-\title{Marketing Analysis Report: BCD Network}
-\author{Marketing Analysis Strategy Department}
-\date{\today}
-
-\begin{document}
-
-\maketitle
-
-\section{Executive Summary}
-
-BCD operates as an exclusive networking platform targeting high-value entrepreneurs and investors in the DACH region. The platform's primary value proposition centers around deal flow and investment opportunities, positioning itself as a premium networking community.
-
-\section{Key Findings}
-
-\begin{itemize}
-\item Exclusive community model with premium positioning
-\item Strong focus on deal flow and investment opportunities  
-\item Multi-channel marketing approach including events and digital platforms
-\item Competitive advantage through local market expertise
-\end{itemize}
-
-\section{Strategic Recommendations}
-
-\subsection{Marketing Recommendations}
-\begin{itemize}
-\item Focus on exclusive positioning to differentiate from competitors
-\item Leverage deal flow as primary value proposition
-\item Develop multi-channel marketing approach
-\item Build strong community engagement through events
-\end{itemize}
-
-\subsection{Competitive Recommendations}
-\begin{itemize}
-\item Emphasize local market expertise vs global competitors
-\item Highlight investment opportunities and deal flow
-\item Position as premium, curated network
-\end{itemize}
-
-\subsection{Growth Recommendations}
-\begin{itemize}
-\item Expand to additional European markets
-\item Develop digital platform for community engagement
-\item Create tiered membership structure
-\end{itemize}
-
-\section{Implementation Plan}
-
-\subsection{Phase 1 (3-6 months)}
-\begin{itemize}
-\item Refine exclusive positioning
-\item Develop deal flow processes
-\item Enhance community engagement
-\end{itemize}
-
-\subsection{Phase 2 (6-12 months)}
-\begin{itemize}
-\item Expand to new markets
-\item Launch digital platform
-\item Scale membership base
-\end{itemize}
-
-\subsection{Phase 3 (12-24 months)}
-\begin{itemize}
-\item Achieve market leadership
-\item Develop additional revenue streams
-\item Establish global presence
-\end{itemize}
-
-\section{Conclusion}
-
-BCD has established a strong foundation in the exclusive networking space with a clear focus on deal flow and investment opportunities. The platform's local market expertise and exclusive positioning provide competitive advantages that can be leveraged for growth and expansion.
-
-\end{document}
-"""
-        return latex_template
+        return LATEX_TEMPLATE
     
     def _update_agent_status(self, status: str, current_task: Optional[str]):
         """Update agent status in the graph database."""
         with self.driver.session() as session:
-            session.run("""
+            session.execute_write(lambda tx: tx.run("""
                 MATCH (a:Agent {id: $agent_id})
                 SET a.status = $status, a.current_task = $current_task
             """, {
                 "agent_id": f"{self.agent_type}_agent",
                 "status": status,
                 "current_task": current_task
-            })
+            }).consume())
     
     def _store_result(self, subtask_id: str, result: Dict):
-        """Store task result in the graph database."""
-        with self.driver.session() as session:
-            session.run("""
+        """Store the task result, complete the subtask and free the agent in one transaction."""
+        def store(tx):
+            tx.run("""
                 CREATE (r:Result {
                     id: $result_id,
                     subtask_id: $subtask_id,
                     content: $content,
                     created_at: datetime()
                 })
+                WITH r
+                MATCH (st:SubTask {id: $subtask_id})
+                MERGE (st)-[:PRODUCES]->(r)
+                SET st.status = 'completed'
             """, {
                 "result_id": str(uuid.uuid4()),
                 "subtask_id": subtask_id,
-                "content": json.dumps(result)
+                # Neo4j string property, so decode orjson's bytes
+                "content": orjson.dumps(result).decode()
             })
-            
-            session.run("""
-                MATCH (st:SubTask {id: $subtask_id})
-                MATCH (r:Result {subtask_id: $subtask_id})
-                MERGE (st)-[:PRODUCES]->(r)
-            """, {"subtask_id": subtask_id})
-            
-            session.run("""
-                MATCH (st:SubTask {id: $subtask_id})
-                SET st.status = 'completed'
-            """, {"subtask_id": subtask_id})
+            tx.run("""
+                MATCH (a:Agent {id: $agent_id})
+                SET a.status = 'available', a.current_task = null
+            """, {"agent_id": f"{self.agent_type}_agent"})
+        
+        with self.driver.session() as session:
+            session.execute_write(store)
 
 # FastAPI app
-app = FastAPI(title="Report Agent", version="1.0.0")
+app = FastAPI(title="Report Agent", version="1.0.0", default_response_class=ORJSONResponse)
 report_agent = ReportAgent()
 
 @app.post("/task", response_model=TaskResponse)
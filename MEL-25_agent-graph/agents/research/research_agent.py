@@ -5,20 +5,34 @@ Specializes in web scraping, data collection, and market research.
 """
 
 import os
-import json
+import re
+import time
+import asyncio
 import logging
-import requests
+import threading
+import httpx
+from concurrent.futures import ProcessPoolExecutor
+import orjson
+from cachetools import LRUCache
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from urllib.parse import urljoin, urlsplit
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
+from neo4j import AsyncGraphDatabase
 import uvicorn
 
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:  # fall back to BeautifulSoup
+    HTMLParser = None
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Research Agent", version="1.0.0")
+app = FastAPI(title="Research Agent", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Configuration
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
@@ -26,7 +40,30 @@ NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 RESEARCH_STORAGE_URL = os.getenv("RESEARCH_STORAGE_URL", "http://localhost:8001")
+STORE_URL = f"{RESEARCH_STORAGE_URL}/api/data"
 AGENT_ID = "research_agent"
+MAX_PAGE_BYTES = 512 * 1024  # stop reading pages past this size
+MAX_HEADINGS = 10
+MAX_LINKS = 20
+MAX_IMAGES = 10
+MAX_PARAGRAPHS = 20
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))
+SCRAPE_CACHE_TTL = 600  # seconds before a cached page is revalidated
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+_background_tasks = set()
+
+# Link text keywords that mark contact details, and link URLs that point at social media
+_CONTACT_TEXT_RE = re.compile(r"contact|email", re.IGNORECASE)
+_SOCIAL_URL_RE = re.compile(r"facebook|twitter", re.IGNORECASE)
+
+# URL -> {"result", "etag", "last_modified", "fetched_at"}; stale entries are kept for conditional GETs
+_scrape_cache = LRUCache(maxsize=256)
+_scrape_cache_lock = threading.Lock()
+
+# URL -> (scrape result, BCD analysis derived from it); reused while the scrape cache
+# keeps returning the same result object, so freshness follows its TTL and revalidation
+_bcd_analysis_cache = LRUCache(maxsize=64)
 
 class TaskRequest(BaseModel):
     task_id: str
@@ -40,32 +77,86 @@ class TaskResponse(BaseModel):
     results: Dict[str, Any]
     message: str
 
-def _initialize_neo4j_connection():
+async def _initialize_neo4j_connection():
     """Initialize Neo4j connection with retry logic."""
-    from neo4j import GraphDatabase
-    import time
-    
     max_retries = 10
     retry_delay = 2
     
     for attempt in range(max_retries):
+        driver = AsyncGraphDatabase.driver(
+            NEO4J_URI,
+            auth=(NEO4J_USER, NEO4J_PASSWORD),
+            max_connection_pool_size=50,
+            connection_acquisition_timeout=10
+        )
         try:
-            driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
             # Test connection
-            with driver.session() as session:
-                session.run("RETURN 1")
+            async with driver.session() as session:
+                await session.run("RETURN 1")
             logger.info("Successfully connected to Neo4j")
             return driver
         except Exception as e:
+            await driver.close()
             logger.warning(f"Attempt {attempt + 1}/{max_retries} failed to connect to Neo4j: {e}")
             if attempt < max_retries - 1:
-                time.sleep(retry_delay)
+                await asyncio.sleep(retry_delay)
                 retry_delay *= 1.5
             else:
                 logger.error("Failed to connect to Neo4j after all retries")
                 raise
 
-def _store_research_data(task_id: str, data_type: str, content: Dict[str, Any]):
+@app.on_event("startup")
+async def startup():
+    """Open the Neo4j driver, HTTP client and HTML parse pool once; they are shared by all requests."""
+    app.state.neo4j = await _initialize_neo4j_connection()
+    app.state.parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    # Status writes MERGE on Agent.agent_id; index it so they do not scan every Agent node
+    async with app.state.neo4j.session() as session:
+        await session.run("CREATE INDEX agent_agent_id IF NOT EXISTS FOR (a:Agent) ON (a.agent_id)")
+    app.state.http = httpx.AsyncClient(
+        # The transport retries connection failures only, so a POST is never sent twice
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+        ),
+        timeout=30,
+        follow_redirects=True
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush pending status writes, then close the shared Neo4j driver, HTTP client and parse pool."""
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    app.state.parse_pool.shutdown(cancel_futures=True)
+    await app.state.http.aclose()
+    await app.state.neo4j.close()
+
+async def _write_agent_status(tx, status: str, task_id: str):
+    await tx.run("""
+        MERGE (a:Agent {agent_id: $agent_id})
+        SET a.status = $status, a.current_task = $task_id
+    """, agent_id=AGENT_ID, status=status, task_id=task_id)
+
+async def _set_agent_status(status: str, task_id: str = "", after: Optional[asyncio.Task] = None):
+    """Record the agent status in Neo4j, once any earlier status write has landed."""
+    if after is not None:
+        await asyncio.gather(after, return_exceptions=True)
+    try:
+        async with app.state.neo4j.session() as session:
+            await session.execute_write(_write_agent_status, status, task_id)
+    except Exception as e:
+        logger.warning(f"Failed to set agent status to {status}: {e}")
+
+def _in_background(coro) -> asyncio.Task:
+    """Run coro without blocking the request, keeping a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def _store_research_data(task_id: str, data_type: str, content: Dict[str, Any]):
     """Store research data in the research storage service."""
     try:
         research_data = {
@@ -81,9 +172,10 @@ def _store_research_data(task_id: str, data_type: str, content: Dict[str, Any]):
             }
         }
         
-        response = requests.post(
-            f"{RESEARCH_STORAGE_URL}/api/data",
-            json=research_data,
+        response = await app.state.http.post(
+            STORE_URL,
+            content=orjson.dumps(research_data),
+            headers={"Content-Type": "application/json"},
             timeout=10
         )
         
@@ -98,79 +190,214 @@ def _store_research_data(task_id: str, data_type: str, content: Dict[str, Any]):
         logger.error(f"Error storing research data: {e}")
         return False
 
-def _scrape_website(url: str) -> Dict[str, Any]:
-    """Scrape website content and extract relevant information."""
-    try:
-        import requests
-        from bs4 import BeautifulSoup
-        from urllib.parse import urljoin, urlparse
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract basic information
-        title = soup.find('title')
-        title_text = title.get_text() if title else "No title found"
-        
-        # Extract meta description
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        description = meta_desc.get('content') if meta_desc else "No description found"
+def _resolve_url(url: str, origin: str, href: str) -> str:
+    """urljoin(url, href), skipping the reparse of url for absolute and root-relative hrefs."""
+    if href.startswith(('http://', 'https://')):
+        return href
+    if href.startswith('/') and not href.startswith('//') and '/.' not in href:
+        return origin + href
+    return urljoin(url, href)
+
+def _parse_html(content: bytes, url: str) -> Dict[str, Any]:
+    """Extract title, description, headings, links, images and paragraphs using selectolax.
+    
+    Walks the DOM once, in document order, and stops as soon as every list is full.
+    """
+    tree = HTMLParser(content)
+    base = urlsplit(url)
+    origin = f"{base.scheme}://{base.netloc}"
+    
+    title_text = None
+    description = None
+    # Headings are reported all h1 first, then h2, then h3, so collect them per level
+    heading_levels = {'h1': [], 'h2': [], 'h3': []}
+    links = []
+    images = []
+    text_content = []
+    # Bound appends skip the attribute lookup per node; open_lists counts lists still below their cap
+    add_link = links.append
+    add_image = images.append
+    add_text = text_content.append
+    open_lists = 4
+    
+    for node in tree.root.traverse():
+        tag = node.tag
         
-        # Extract headings
-        headings = []
-        for tag in ['h1', 'h2', 'h3']:
-            for heading in soup.find_all(tag):
-                headings.append({
+        if tag in heading_levels:
+            level = heading_levels[tag]
+            if len(level) < MAX_HEADINGS and len(heading_levels['h1']) < MAX_HEADINGS:
+                level.append({
                     'level': tag,
-                    'text': heading.get_text().strip()
+                    'text': node.text().strip()
                 })
-        
-        # Extract links
-        links = []
-        for link in soup.find_all('a', href=True):
-            href = link.get('href')
-            text = link.get_text().strip()
-            if href and text:
-                links.append({
-                    'url': urljoin(url, href),
-                    'text': text
+                # MAX_HEADINGS h1s fill the list; later h2/h3 can no longer make the cut
+                open_lists -= tag == 'h1' and len(level) == MAX_HEADINGS
+        elif tag == 'a':
+            href = node.attributes.get('href')
+            if href and len(links) < MAX_LINKS:
+                text = node.text().strip()
+                if text:
+                    add_link({
+                        'url': _resolve_url(url, origin, href),
+                        'text': text
+                    })
+                    open_lists -= len(links) == MAX_LINKS
+        elif tag == 'img':
+            src = node.attributes.get('src')
+            if src and len(images) < MAX_IMAGES:
+                add_image({
+                    'src': _resolve_url(url, origin, src),
+                    'alt': node.attributes.get('alt') or ''
                 })
+                open_lists -= len(images) == MAX_IMAGES
+        elif tag in ('p', 'div'):
+            if len(text_content) < MAX_PARAGRAPHS:
+                text = node.text().strip()
+                if len(text) > 50:  # Only meaningful content
+                    add_text(text)
+                    open_lists -= len(text_content) == MAX_PARAGRAPHS
+        elif tag == 'title':
+            if title_text is None:
+                title_text = node.text()
+        elif tag == 'meta':
+            if description is None and node.attributes.get('name') == 'description':
+                description = node.attributes.get('content')
         
-        # Extract images
-        images = []
-        for img in soup.find_all('img'):
-            src = img.get('src')
-            alt = img.get('alt', '')
-            if src:
-                images.append({
-                    'src': urljoin(url, src),
-                    'alt': alt
-                })
+        # Title and description live in <head>, so they are settled before the lists fill up
+        if not open_lists:
+            break
+    
+    return {
+        "title": title_text if title_text is not None else "No title found",
+        "description": description if description is not None else "No description found",
+        "headings": (heading_levels['h1'] + heading_levels['h2'] + heading_levels['h3'])[:MAX_HEADINGS],
+        "links": links,
+        "images": images,
+        "text_content": text_content
+    }
+
+def _parse_html_bs4(content: bytes, url: str) -> Dict[str, Any]:
+    """Same extraction as _parse_html, using BeautifulSoup when selectolax is unavailable."""
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    title = soup.find('title')
+    title_text = title.get_text() if title else "No title found"
+    
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    description = meta_desc.get('content') if meta_desc else "No description found"
+    
+    headings = []
+    for tag in ['h1', 'h2', 'h3']:
+        for heading in soup.find_all(tag, limit=MAX_HEADINGS):
+            headings.append({
+                'level': tag,
+                'text': heading.get_text().strip()
+            })
+    
+    links = []
+    for link in soup.find_all('a', href=True):
+        href = link.get('href')
+        text = link.get_text().strip()
+        if href and text:
+            links.append({
+                'url': urljoin(url, href),
+                'text': text
+            })
+    
+    images = []
+    for img in soup.find_all('img'):
+        src = img.get('src')
+        alt = img.get('alt', '')
+        if src:
+            images.append({
+                'src': urljoin(url, src),
+                'alt': alt
+            })
+    
+    text_content = []
+    for paragraph in soup.find_all(['p', 'div']):
+        text = paragraph.get_text().strip()
+        if text and len(text) > 50:
+            text_content.append(text)
+    
+    return {
+        "title": title_text,
+        "description": description,
+        "headings": headings[:MAX_HEADINGS],
+        "links": links,
+        "images": images,
+        "text_content": text_content
+    }
+
+async def _scrape_website(url: str) -> Dict[str, Any]:
+    """Scrape website content and extract relevant information.
+    
+    Results are cached per URL for SCRAPE_CACHE_TTL seconds; after that the page is
+    revalidated with a conditional GET and reused as-is on 304 Not Modified.
+    """
+    with _scrape_cache_lock:
+        cached = _scrape_cache.get(url)
+    if cached and time.monotonic() - cached["fetched_at"] < SCRAPE_CACHE_TTL:
+        return cached["result"]
+    
+    try:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+        if cached and cached["etag"]:
+            headers['If-None-Match'] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers['If-Modified-Since'] = cached["last_modified"]
         
-        # Extract text content
-        text_content = []
-        for paragraph in soup.find_all(['p', 'div']):
-            text = paragraph.get_text().strip()
-            if text and len(text) > 50:  # Only meaningful content
-                text_content.append(text)
+        # Stream the body so oversized pages are cut off at MAX_PAGE_BYTES instead of buffered whole
+        async with app.state.http.stream("GET", url, headers=headers, timeout=httpx.Timeout(30, connect=5)) as response:
+            if response.status_code == 304 and cached:
+                with _scrape_cache_lock:
+                    cached["fetched_at"] = time.monotonic()
+                return cached["result"]
+            response.raise_for_status()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            
+            content_type = response.headers.get("Content-Type", "text/html")
+            if "html" not in content_type:
+                raise ValueError(f"Unsupported content type: {content_type}")
+            
+            body = bytearray()
+            async for chunk in response.aiter_bytes(chunk_size=16384):
+                body += chunk
+                if len(body) >= MAX_PAGE_BYTES:
+                    break
         
-        return {
+        # Parsing is CPU-bound, so run it in a worker process to keep the event loop
+        # free and let concurrent scrapes use every core
+        parse = _parse_html if HTMLParser is not None else _parse_html_bs4
+        page = await asyncio.get_running_loop().run_in_executor(
+            app.state.parse_pool, parse, bytes(body[:MAX_PAGE_BYTES]), url
+        )
+        
+        result = {
             "target_url": url,
-            "title": title_text,
-            "description": description,
-            "headings": headings[:10],  # Limit to first 10 headings
-            "links": links[:20],  # Limit to first 20 links
-            "images": images[:10],  # Limit to first 10 images
-            "text_content": text_content[:20],  # Limit to first 20 paragraphs
+            "title": page["title"],
+            "description": page["description"],
+            "headings": page["headings"][:MAX_HEADINGS],
+            "links": page["links"][:MAX_LINKS],
+            "images": page["images"][:MAX_IMAGES],
+            "text_content": page["text_content"][:MAX_PARAGRAPHS],
             "scraped_at": datetime.now().isoformat()
         }
         
+        with _scrape_cache_lock:
+            _scrape_cache[url] = {
+                "result": result,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": time.monotonic()
+            }
+        return result
+        
     except Exception as e:
         logger.error(f"Error scraping website {url}: {e}")
         return {
@@ -179,10 +406,38 @@ def _scrape_website(url: str) -> Dict[str, Any]:
             "scraped_at": datetime.now().isoformat()
         }
 
-def _analyze_bcd_website(url: str) -> Dict[str, Any]:
-    """Analyze Better Call Dominik website specifically."""
+def _scan_marketing_links(links: List[Dict[str, str]]) -> Dict[str, bool]:
+    """Detect CTA, social media and contact links in one pass, stopping once all are found."""
+    has_call_to_action = has_social_media = has_contact_info = False
+    for link in links:
+        for keyword in _CONTACT_TEXT_RE.findall(link.get("text", "")):
+            has_contact_info = True
+            if keyword.lower() == "contact":
+                has_call_to_action = True
+        if not has_social_media and _SOCIAL_URL_RE.search(link.get("url", "")):
+            has_social_media = True
+        if has_call_to_action and has_social_media and has_contact_info:
+            break
+    
+    return {
+        "has_call_to_action": has_call_to_action,
+        "has_social_media": has_social_media,
+        "has_contact_info": has_contact_info
+    }
+
+async def _analyze_bcd_website(url: str) -> Dict[str, Any]:
+    """Analyze Better Call Dominik website specifically, reusing the analysis of an unchanged page."""
     try:
-        scraped_data = _scrape_website(url)
+        scraped_data = await _scrape_website(url)
+        cached = _bcd_analysis_cache.get(url)
+        if cached and cached[0] is scraped_data:
+            return cached[1]
+        
+        headings = scraped_data.get("headings", [])
+        links = scraped_data.get("links", [])
+        headings_count = len(headings)
+        images_count = len(scraped_data.get("images", []))
+        paragraphs_count = len(scraped_data.get("text_content", []))
         
         # Analyze the scraped data
         analysis = {
@@ -191,29 +446,27 @@ def _analyze_bcd_website(url: str) -> Dict[str, Any]:
                 "title": scraped_data.get("title", ""),
                 "description": scraped_data.get("description", ""),
                 "content_structure": {
-                    "headings_count": len(scraped_data.get("headings", [])),
-                    "links_count": len(scraped_data.get("links", [])),
-                    "images_count": len(scraped_data.get("images", [])),
-                    "text_paragraphs": len(scraped_data.get("text_content", []))
+                    "headings_count": headings_count,
+                    "links_count": len(links),
+                    "images_count": images_count,
+                    "text_paragraphs": paragraphs_count
                 },
-                "marketing_elements": {
-                    "has_call_to_action": any("contact" in link.get("text", "").lower() for link in scraped_data.get("links", [])),
-                    "has_social_media": any("facebook" in link.get("url", "").lower() or "twitter" in link.get("url", "").lower() for link in scraped_data.get("links", [])),
-                    "has_contact_info": any("contact" in link.get("text", "").lower() or "email" in link.get("text", "").lower() for link in scraped_data.get("links", []))
-                }
+                "marketing_elements": _scan_marketing_links(links)
             },
             "content_analysis": {
-                "main_topics": [h.get("text", "") for h in scraped_data.get("headings", [])[:5]],
+                "main_topics": [h.get("text", "") for h in headings[:5]],
                 "key_phrases": [],
-                "content_quality": "high" if len(scraped_data.get("text_content", [])) > 5 else "medium"
+                "content_quality": "high" if paragraphs_count > 5 else "medium"
             },
             "technical_analysis": {
                 "has_meta_description": bool(scraped_data.get("description")),
-                "has_structured_content": len(scraped_data.get("headings", [])) > 0,
-                "has_images": len(scraped_data.get("images", [])) > 0
+                "has_structured_content": headings_count > 0,
+                "has_images": images_count > 0
             }
         }
         
+        if "error" not in scraped_data:
+            _bcd_analysis_cache[url] = (scraped_data, analysis)
         return analysis
         
     except Exception as e:
@@ -226,27 +479,21 @@ def _analyze_bcd_website(url: str) -> Dict[str, Any]:
 @app.post("/task", response_model=TaskResponse)
 async def process_task(task_request: TaskRequest):
     """Process a research task."""
+    busy_write = None
     try:
         logger.info(f"Processing research task: {task_request.task_id}")
         
-        # Initialize Neo4j connection
-        driver = _initialize_neo4j_connection()
-        
-        # Update agent status in Neo4j
-        with driver.session() as session:
-            session.run("""
-                MERGE (a:Agent {agent_id: $agent_id})
-                SET a.status = 'busy', a.current_task = $task_id
-            """, agent_id=AGENT_ID, task_id=task_request.task_id)
+        # Status writes go to Neo4j in the background so they stay off the response path
+        busy_write = _in_background(_set_agent_status("busy", task_request.task_id))
         
         # Perform research based on task
         if "bettercalldominik.com" in task_request.target_url.lower():
-            research_results = _analyze_bcd_website(task_request.target_url)
+            research_results = await _analyze_bcd_website(task_request.target_url)
         else:
-            research_results = _scrape_website(task_request.target_url)
+            research_results = await _scrape_website(task_request.target_url)
         
         # Store research data
-        _store_research_data(
+        await _store_research_data(
             task_request.task_id,
             "scraped_data",
             {
@@ -257,13 +504,7 @@ async def process_task(task_request: TaskRequest):
         )
         
         # Update agent status back to available
-        with driver.session() as session:
-            session.run("""
-                MERGE (a:Agent {agent_id: $agent_id})
-                SET a.status = 'available', a.current_task = ''
-            """, agent_id=AGENT_ID)
-        
-        driver.close()
+        _in_background(_set_agent_status("available", after=busy_write))
         
         return TaskResponse(
             task_id=task_request.task_id,
@@ -276,16 +517,7 @@ async def process_task(task_request: TaskRequest):
         logger.error(f"Error processing research task: {e}")
         
         # Update agent status back to available on error
-        try:
-            driver = _initialize_neo4j_connection()
-            with driver.session() as session:
-                session.run("""
-                    MERGE (a:Agent {agent_id: $agent_id})
-                    SET a.status = 'available', a.current_task = ''
-                """, agent_id=AGENT_ID)
-            driver.close()
-        except:
-            pass
+        _in_background(_set_agent_status("available", after=busy_write))
         
         raise HTTPException(status_code=500, detail=f"Research task failed: {str(e)}")
 
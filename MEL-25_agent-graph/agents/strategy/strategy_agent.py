@@ -4,23 +4,119 @@ Marketing Analysis Strategy Department - Strategy Agent
 Handles strategy formulation and competitive analysis.
 """
 
-import json
 import logging
 import os
 import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Dict, Optional
 
-from fastapi import FastAPI, HTTPException
+from cachetools import TTLCache
+from fastapi import Depends, FastAPI, HTTPException, Request
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable
+import orjson
 from pydantic import BaseModel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Connections the process-wide Neo4j driver keeps pooled
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL", "50"))
+ANALYSIS_CACHE_TTL = 300  # seconds a parsed analysis result is reused
+
+# Hot-path Cypher, one constant per statement so every call sends identical query text
+CYPHER_GET_ANALYSIS = """
+    MATCH (st:SubTask {id: $task_id})-[:PRODUCES]->(r:Result)
+    RETURN r.content as content
+"""
+
+CYPHER_UPDATE_AGENT_STATUS = """
+    MATCH (a:Agent {id: $agent_id})
+    SET a.status = $status, a.current_task = $current_task
+"""
+
+# MERGE on subtask_id so a retried transaction or a re-sent task updates the
+# subtask's one Result instead of adding another
+CYPHER_STORE_RESULT = """
+    MERGE (r:Result {subtask_id: $subtask_id})
+    ON CREATE SET r.id = $result_id, r.created_at = datetime()
+    SET r.content = $content
+    WITH r
+    MATCH (st:SubTask {id: $subtask_id})
+    MERGE (st)-[:PRODUCES]->(r)
+    SET st.status = 'completed'
+"""
+
+CYPHER_RELEASE_AGENT = """
+    MATCH (a:Agent {id: $agent_id})
+    SET a.status = 'available', a.current_task = null
+"""
+
+# Fixed strategy sections, shared read-only by every strategy result
+RECOMMENDATIONS = {
+    "marketing_recommendations": [
+        "Focus on exclusive positioning to differentiate from competitors",
+        "Leverage deal flow as primary value proposition",
+        "Develop multi-channel marketing approach",
+        "Build strong community engagement through events"
+    ],
+    "competitive_recommendations": [
+        "Emphasize local market expertise vs global competitors",
+        "Highlight investment opportunities and deal flow",
+        "Position as premium, curated network"
+    ],
+    "growth_recommendations": [
+        "Expand to additional European markets",
+        "Develop digital platform for community engagement",
+        "Create tiered membership structure"
+    ]
+}
+
+COMPETITIVE_POSITIONING = {
+    "positioning_statement": "Exclusive network for high-value entrepreneurs and investors focused on deal flow and investment opportunities",
+    "key_differentiators": [
+        "Local market expertise",
+        "Deal flow focus",
+        "Exclusive membership",
+        "Investment opportunities"
+    ],
+    "competitive_advantages": [
+        "Strong local connections",
+        "Investment-focused value proposition",
+        "Exclusive community model"
+    ]
+}
+
+IMPLEMENTATION_PLAN = {
+    "phase_1": {
+        "timeline": "3-6 months",
+        "objectives": [
+            "Refine exclusive positioning",
+            "Develop deal flow processes",
+            "Enhance community engagement"
+        ]
+    },
+    "phase_2": {
+        "timeline": "6-12 months",
+        "objectives": [
+            "Expand to new markets",
+            "Launch digital platform",
+            "Scale membership base"
+        ]
+    },
+    "phase_3": {
+        "timeline": "12-24 months",
+        "objectives": [
+            "Achieve market leadership",
+            "Develop additional revenue streams",
+            "Establish global presence"
+        ]
+    }
+}
+
 # Pydantic models
 class TaskRequest(BaseModel):
     subtask_id: str
@@ -40,6 +136,11 @@ class StrategyAgent:
         self.neo4j_password = os.getenv("NEO4J_PASSWORD", "password")
         self.agent_type = os.getenv("AGENT_TYPE", "strategy")
         
+        # Parsed analysis results keyed by the analysis subtask id (depends_on). This
+        # agent never writes those results, so nothing here invalidates them; the TTL
+        # bounds how long a rewritten analysis result can be served stale
+        self._analysis_cache = TTLCache(maxsize=512, ttl=ANALYSIS_CACHE_TTL)
+        
         # Initialize Neo4j driver with retry logic
         self.driver = None
         self._initialize_neo4j_connection()
@@ -47,6 +148,10 @@ class StrategyAgent:
         # Initialize agent in graph
         self._initialize_agent()
     
+    def close(self):
+        """Close the Neo4j driver and its connection pool."""
+        self.driver.close()
+    
     def _initialize_neo4j_connection(self):
         """Initialize Neo4j connection with retry logic."""
         max_retries = 30
@@ -57,7 +162,11 @@ class StrategyAgent:
                 logger.info(f"Attempting to connect to Neo4j (attempt {attempt + 1}/{max_retries})")
                 self.driver = GraphDatabase.driver(
                     self.neo4j_uri,
-                    auth=(self.neo4j_user, self.neo4j_password)
+                    auth=(self.neo4j_user, self.neo4j_password),
+                    max_connection_pool_size=NEO4J_POOL_SIZE,
+                    connection_acquisition_timeout=30,
+                    max_connection_lifetime=3600,
+                    keep_alive=True
                 )
                 
                 # Test the connection
@@ -82,7 +191,7 @@ class StrategyAgent:
         """Initialize the agent node in the graph database."""
         try:
             with self.driver.session() as session:
-                session.run("""
+                session.execute_write(lambda tx: tx.run("""
                     MERGE (a:Agent {
                         id: $agent_id,
                         type: $agent_type,
@@ -95,7 +204,7 @@ class StrategyAgent:
                     "agent_type": self.agent_type,
                     "capabilities": ["strategy_formulation", "competitive_analysis", "recommendations"],
                     "current_task": ""
-                })
+                }).consume())
             logger.info("Strategy agent initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing strategy agent: {e}")
@@ -107,8 +216,8 @@ class StrategyAgent:
             self._update_agent_status("busy", task_request.subtask_id)
             
             result = await self._formulate_strategy(task_request.parameters)
+            # Also marks the agent available, in the same transaction
             self._store_result(task_request.subtask_id, result)
-            self._update_agent_status("available", None)
             
             return TaskResponse(
                 subtask_id=task_request.subtask_id,
@@ -142,131 +251,76 @@ class StrategyAgent:
     
     def _get_analysis_results(self, task_id: str) -> Optional[Dict]:
         """Get analysis results from the graph database."""
+        if task_id in self._analysis_cache:
+            return self._analysis_cache[task_id]
+        
+        def read(tx):
+            record = tx.run(CYPHER_GET_ANALYSIS, {"task_id": task_id}).single()
+            return record["content"] if record else None
+        
         with self.driver.session() as session:
-            result = session.run("""
-                MATCH (st:SubTask {id: $task_id})-[:PRODUCES]->(r:Result)
-                RETURN r.content as content
-            """, {"task_id": task_id})
-            
-            record = result.single()
-            if record:
-                return json.loads(record["content"])
-            return None
+            content = session.execute_read(read)
+        
+        if content:
+            analysis_data = orjson.loads(content)
+            self._analysis_cache[task_id] = analysis_data
+            return analysis_data
+        return None
     
     def _generate_recommendations(self, analysis_data: Optional[Dict]) -> Dict:
         """Generate strategic recommendations."""
-        return {
-            "marketing_recommendations": [
-                "Focus on exclusive positioning to differentiate from competitors",
-                "Leverage deal flow as primary value proposition",
-                "Develop multi-channel marketing approach",
-                "Build strong community engagement through events"
-            ],
-            "competitive_recommendations": [
-                "Emphasize local market expertise vs global competitors",
-                "Highlight investment opportunities and deal flow",
-                "Position as premium, curated network"
-            ],
-            "growth_recommendations": [
-                "Expand to additional European markets",
-                "Develop digital platform for community engagement",
-                "Create tiered membership structure"
-            ]
-        }
+        return RECOMMENDATIONS
     
     def _analyze_competitive_positioning(self, analysis_data: Optional[Dict]) -> Dict:
         """Analyze competitive positioning."""
-        return {
-            "positioning_statement": "Exclusive network for high-value entrepreneurs and investors focused on deal flow and investment opportunities",
-            "key_differentiators": [
-                "Local market expertise",
-                "Deal flow focus",
-                "Exclusive membership",
-                "Investment opportunities"
-            ],
-            "competitive_advantages": [
-                "Strong local connections",
-                "Investment-focused value proposition",
-                "Exclusive community model"
-            ]
-        }
+        return COMPETITIVE_POSITIONING
     
     def _create_implementation_plan(self) -> Dict:
         """Create implementation plan."""
-        return {
-            "phase_1": {
-                "timeline": "3-6 months",
-                "objectives": [
-                    "Refine exclusive positioning",
-                    "Develop deal flow processes",
-                    "Enhance community engagement"
-                ]
-            },
-            "phase_2": {
-                "timeline": "6-12 months",
-                "objectives": [
-                    "Expand to new markets",
-                    "Launch digital platform",
-                    "Scale membership base"
-                ]
-            },
-            "phase_3": {
-                "timeline": "12-24 months",
-                "objectives": [
-                    "Achieve market leadership",
-                    "Develop additional revenue streams",
-                    "Establish global presence"
-                ]
-            }
-        }
+        return IMPLEMENTATION_PLAN
     
     def _update_agent_status(self, status: str, current_task: Optional[str]):
         """Update agent status in the graph database."""
         with self.driver.session() as session:
-            session.run("""
-                MATCH (a:Agent {id: $agent_id})
-                SET a.status = $status, a.current_task = $current_task
-            """, {
+            session.execute_write(lambda tx: tx.run(CYPHER_UPDATE_AGENT_STATUS, {
                 "agent_id": f"{self.agent_type}_agent",
                 "status": status,
                 "current_task": current_task
-            })
+            }).consume())
     
     def _store_result(self, subtask_id: str, result: Dict):
-        """Store task result in the graph database."""
-        with self.driver.session() as session:
-            session.run("""
-                CREATE (r:Result {
-                    id: $result_id,
-                    subtask_id: $subtask_id,
-                    content: $content,
-                    created_at: datetime()
-                })
-            """, {
-                "result_id": str(uuid.uuid4()),
+        """Store the task result, complete the subtask and free the agent in one transaction."""
+        def store(tx):
+            tx.run(CYPHER_STORE_RESULT, {
+                # Derived from the subtask, so every attempt writes the same id
+                "result_id": str(uuid.uuid5(uuid.NAMESPACE_OID, subtask_id)),
                 "subtask_id": subtask_id,
-                "content": json.dumps(result)
+                # Neo4j string property, so decode orjson's bytes
+                "content": orjson.dumps(result).decode()
             })
-            
-            session.run("""
-                MATCH (st:SubTask {id: $subtask_id})
-                MATCH (r:Result {subtask_id: $subtask_id})
-                MERGE (st)-[:PRODUCES]->(r)
-            """, {"subtask_id": subtask_id})
-            
-            session.run("""
-                MATCH (st:SubTask {id: $subtask_id})
-                SET st.status = 'completed'
-            """, {"subtask_id": subtask_id})
+            tx.run(CYPHER_RELEASE_AGENT, {"agent_id": f"{self.agent_type}_agent"})
+        
+        with self.driver.session() as session:
+            session.execute_write(store)
 
 # FastAPI app
-app = FastAPI(title="Strategy Agent", version="1.0.0")
-strategy_agent = StrategyAgent()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect once per worker; every request shares this driver's pool."""
+    app.state.strategy_agent = StrategyAgent()
+    yield
+    app.state.strategy_agent.close()
+
+app = FastAPI(title="Strategy Agent", version="1.0.0", lifespan=lifespan)
+
+def get_agent(request: Request) -> StrategyAgent:
+    """Resolve the worker's shared StrategyAgent."""
+    return request.app.state.strategy_agent
 
 @app.post("/task", response_model=TaskResponse)
-async def process_task(task_request: TaskRequest):
+async def process_task(task_request: TaskRequest, agent: StrategyAgent = Depends(get_agent)):
     """Process a strategy task."""
-    return await strategy_agent.process_task(task_request)
+    return await agent.process_task(task_request)
 
 @app.get("/health")
 async def health_check():
@@ -5,7 +5,6 @@ Manages the graph-based agent network and coordinates tasks between agents.
 """
 
 import asyncio
-import json
 import logging
 import os
 import time
@@ -13,16 +12,86 @@ import uuid
 from datetime import datetime
 from typing import Dict, List, Optional
 
-import requests
+import httpx
 from fastapi import FastAPI, HTTPException
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable
+import orjson
 from pydantic import BaseModel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Connections the process-wide Neo4j driver keeps pooled
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL", "50"))
+# Agent dispatches allowed in flight at once across all running workflows
+MAX_INFLIGHT_DISPATCHES = int(os.getenv("MAX_INFLIGHT", "32"))
+
+# Lookup indexes for every property the agents MATCH on. Kept non-unique, like the
+# report agent's: agent nodes are MERGEd on several properties and may already have duplicates
+GRAPH_INDEXES = [
+    "CREATE INDEX agent_id IF NOT EXISTS FOR (a:Agent) ON (a.id)",
+    "CREATE INDEX task_id IF NOT EXISTS FOR (t:Task) ON (t.id)",
+    "CREATE INDEX subtask_id IF NOT EXISTS FOR (st:SubTask) ON (st.id)",
+    "CREATE INDEX result_subtask_id IF NOT EXISTS FOR (r:Result) ON (r.subtask_id)"
+]
+
+# Startup writes: every agent node in one statement, every COORDINATES edge in another
+CYPHER_MERGE_AGENTS = """
+    UNWIND $agents AS agent
+    MERGE (a:Agent {
+        id: agent.id,
+        type: agent.type,
+        status: 'available',
+        capabilities: agent.capabilities,
+        current_task: ''
+    })
+"""
+
+CYPHER_COORDINATE_AGENTS = """
+    MATCH (coord:Agent {id: 'coordination_agent'})
+    UNWIND $agent_ids AS agent_id
+    MATCH (agent:Agent {id: agent_id})
+    MERGE (coord)-[:COORDINATES]->(agent)
+"""
+
+# Hot-path Cypher, one constant per statement so every call sends identical query text
+CYPHER_ASSIGN_SUBTASK_BATCH = """
+    UNWIND $rows AS row
+    CREATE (st:SubTask {
+        id: row.subtask_id,
+        type: row.task_type,
+        status: 'pending',
+        parameters: row.parameters,
+        created_at: datetime()
+    })
+    WITH st, row
+    MATCH (task:Task {id: row.task_id})
+    MATCH (agent:Agent {id: row.agent_id})
+    MERGE (task)-[:CONTAINS]->(st)
+    MERGE (agent)-[:ASSIGNED_TO]->(st)
+"""
+
+# Orchestrator, strategy and report agents key their nodes on id/type; the research and
+# analysis agents' status writes MERGE on agent_id and set no type or capabilities
+CYPHER_AGENT_STATUS = """
+    MATCH (a:Agent)
+    RETURN coalesce(a.id, a.agent_id, 'unknown') AS agent_id,
+           coalesce(a.type, 'unknown') AS agent_type,
+           coalesce(a.status, 'unknown') AS status,
+           coalesce(a.current_task, '') AS current_task,
+           coalesce(a.capabilities, []) AS capabilities
+"""
+
+CYPHER_TASK_STATUS = """
+    MATCH (task:Task {id: $task_id})
+    OPTIONAL MATCH (task)-[:CONTAINS]->(subtask:SubTask)
+    RETURN task.id AS id, task.status AS status, task.type AS type,
+           task.created_at AS created_at, subtask.id AS subtask_id,
+           subtask.type AS subtask_type, subtask.status AS subtask_status
+"""
+
 # Pydantic models for API
 class TaskRequest(BaseModel):
     task_type: str
@@ -63,6 +132,23 @@ class Orchestrator:
         
         # Initialize graph database
         self._initialize_graph()
+        
+        # Shared client so agent dispatches reuse keep-alive connections
+        self.http = httpx.AsyncClient(
+            timeout=120,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+        self._dispatch_sem = asyncio.Semaphore(MAX_INFLIGHT_DISPATCHES)
+        # Running workflows, referenced here so they are not garbage collected
+        self._workflows = set()
+    
+    async def close(self):
+        """Stop running workflows, then close the HTTP client and the Neo4j driver with its connection pool."""
+        for workflow in self._workflows:
+            workflow.cancel()
+        await asyncio.gather(*self._workflows, return_exceptions=True)
+        await self.http.aclose()
+        self.driver.close()
     
     def _initialize_neo4j_connection(self):
         """Initialize Neo4j connection with retry logic."""
@@ -74,7 +160,11 @@ class Orchestrator:
                 logger.info(f"Attempting to connect to Neo4j (attempt {attempt + 1}/{max_retries})")
                 self.driver = GraphDatabase.driver(
                     self.neo4j_uri,
-                    auth=(self.neo4j_user, self.neo4j_password)
+                    auth=(self.neo4j_user, self.neo4j_password),
+                    max_connection_pool_size=NEO4J_POOL_SIZE,
+                    connection_acquisition_timeout=30,
+                    max_connection_lifetime=3600,
+                    keep_alive=True
                 )
                 
                 # Test the connection
@@ -99,48 +189,33 @@ class Orchestrator:
         """Initialize the graph database with agent nodes and relationships."""
         try:
             with self.driver.session() as session:
-                # Create agent nodes
-                for agent_type in self.agents.keys():
-                    session.run("""
-                        MERGE (a:Agent {
-                            id: $agent_id,
-                            type: $agent_type,
-                            status: $status,
-                            capabilities: $capabilities,
-                            current_task: $current_task
-                        })
-                    """, {
-                        "agent_id": f"{agent_type}_agent",
-                        "agent_type": agent_type,
-                        "status": "available",
-                        "capabilities": self._get_agent_capabilities(agent_type),
-                        "current_task": ""
-                    })
-                
-                # Create coordination agent
-                session.run("""
-                    MERGE (a:Agent {
-                        id: 'coordination_agent',
-                        type: 'coordination',
-                        status: 'available',
-                        capabilities: ['task_distribution', 'workflow_management'],
-                        current_task: ''
-                    })
-                """)
+                for statement in GRAPH_INDEXES:
+                    session.run(statement)
                 
-                # Create relationships between coordination agent and other agents
-                for agent_type in self.agents.keys():
-                    session.run("""
-                        MATCH (coord:Agent {id: 'coordination_agent'})
-                        MATCH (agent:Agent {id: $agent_id})
-                        MERGE (coord)-[:COORDINATES]->(agent)
-                    """, {"agent_id": f"{agent_type}_agent"})
-                    
+                session.execute_write(self._write_agent_nodes)
+            
             logger.info("Graph database initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing graph database: {e}")
             raise
     
+    def _write_agent_nodes(self, tx):
+        """Merge every agent node, then link the coordination agent to the others."""
+        tx.run(CYPHER_MERGE_AGENTS, {"agents": [
+            {
+                "id": f"{agent_type}_agent",
+                "type": agent_type,
+                "capabilities": self._get_agent_capabilities(agent_type)
+            } for agent_type in self.agents
+        ] + [{
+            "id": "coordination_agent",
+            "type": "coordination",
+            "capabilities": ["task_distribution", "workflow_management"]
+        }]})
+        tx.run(CYPHER_COORDINATE_AGENTS, {
+            "agent_ids": [f"{agent_type}_agent" for agent_type in self.agents]
+        })
+    
     def _get_agent_capabilities(self, agent_type: str) -> List[str]:
         """Get capabilities for a specific agent type."""
         capabilities = {
@@ -155,9 +230,9 @@ class Orchestrator:
         """Create a new task and distribute it to appropriate agents."""
         task_id = str(uuid.uuid4())
         
-        # Create task node in graph
-        with self.driver.session() as session:
-            session.run("""
+        # Create task node in graph and assign it to the coordination agent
+        def create(tx):
+            tx.run("""
                 CREATE (t:Task {
                     id: $task_id,
                     type: $task_type,
@@ -174,14 +249,15 @@ class Orchestrator:
                 "target_url": task_request.target_url,
                 "analysis_scope": task_request.analysis_scope
             })
-            
-            # Assign task to coordination agent
-            session.run("""
+            tx.run("""
                 MATCH (coord:Agent {id: 'coordination_agent'})
                 MATCH (task:Task {id: $task_id})
                 MERGE (coord)-[:ASSIGNED_TO]->(task)
             """, {"task_id": task_id})
         
+        with self.driver.session() as session:
+            session.execute_write(create)
+        
         # Start workflow
         await self._start_workflow(task_id, task_request)
         
@@ -192,91 +268,80 @@ class Orchestrator:
         )
     
     async def _start_workflow(self, task_id: str, task_request: TaskRequest):
-        """Start the workflow for a given task."""
+        """Create the workflow's subtasks and start dispatching them in the background."""
         try:
-            # Phase 1: Research
-            research_task = await self._assign_task_to_agent(
-                "research", task_id, "web_scraping", {
+            # Subtask ids are generated up front so every phase can name the
+            # phase it depends on before anything is written
+            research_task, analysis_task, strategy_task, report_task = (
+                str(uuid.uuid4()) for _ in range(4)
+            )
+            phases = [
+                # Phase 1: Research
+                ("research", research_task, "web_scraping", {
                     "target_url": task_request.target_url,
                     "scope": task_request.analysis_scope
-                }
-            )
-            
-            # Phase 2: Analysis (depends on research)
-            analysis_task = await self._assign_task_to_agent(
-                "analysis", task_id, "data_analysis", {
+                }),
+                # Phase 2: Analysis (depends on research)
+                ("analysis", analysis_task, "data_analysis", {
                     "depends_on": research_task,
                     "scope": task_request.analysis_scope
-                }
-            )
-            
-            # Phase 3: Strategy (depends on analysis)
-            strategy_task = await self._assign_task_to_agent(
-                "strategy", task_id, "strategy_formulation", {
+                }),
+                # Phase 3: Strategy (depends on analysis)
+                ("strategy", strategy_task, "strategy_formulation", {
                     "depends_on": analysis_task,
                     "scope": task_request.analysis_scope
-                }
-            )
-            
-            # Phase 4: Report (depends on strategy)
-            await self._assign_task_to_agent(
-                "report", task_id, "report_generation", {
+                }),
+                # Phase 4: Report (depends on strategy)
+                ("report", report_task, "report_generation", {
                     "depends_on": strategy_task,
                     "scope": task_request.analysis_scope
-                }
-            )
+                })
+            ]
             
-            logger.info(f"Workflow started for task {task_id}")
+            self._create_subtasks_batch([
+                {
+                    "subtask_id": subtask_id,
+                    "task_id": task_id,
+                    "agent_id": f"{agent_type}_agent",
+                    "task_type": task_type,
+                    # Neo4j string property, so decode orjson's bytes
+                    "parameters": orjson.dumps(parameters).decode()
+                } for agent_type, subtask_id, task_type, parameters in phases
+            ])
             
         except Exception as e:
             logger.error(f"Error starting workflow for task {task_id}: {e}")
             raise
-    
-    async def _assign_task_to_agent(self, agent_type: str, task_id: str, 
-                                   task_type: str, parameters: Dict) -> str:
-        """Assign a task to a specific agent."""
-        subtask_id = str(uuid.uuid4())
         
-        # Create subtask in graph
-        with self.driver.session() as session:
-            session.run("""
-                CREATE (st:SubTask {
-                    id: $subtask_id,
-                    type: $task_type,
-                    status: 'pending',
-                    parameters: $parameters,
-                    created_at: datetime()
-                })
-            """, {
-                "subtask_id": subtask_id,
-                "task_type": task_type,
-                "parameters": json.dumps(parameters)
-            })
+        # The caller gets its task id once the graph is written; the phases
+        # then run without holding the request open
+        workflow = asyncio.create_task(self._run_workflow(task_id, phases))
+        self._workflows.add(workflow)
+        workflow.add_done_callback(self._workflows.discard)
+        logger.info(f"Workflow started for task {task_id}")
+    
+    async def _run_workflow(self, task_id: str, phases: List[tuple]):
+        """Send each phase to its agent, failing the task if one cannot be completed."""
+        try:
+            # Agents read their dependency's result once when they start, so
+            # phases are still dispatched one after another
+            for agent_type, subtask_id, task_type, parameters in phases:
+                await self._send_task_to_agent(agent_type, subtask_id, task_type, parameters)
             
-            # Link subtask to main task
-            session.run("""
-                MATCH (task:Task {id: $task_id})
-                MATCH (subtask:SubTask {id: $subtask_id})
-                MERGE (task)-[:CONTAINS]->(subtask)
-            """, {
-                "task_id": task_id,
-                "subtask_id": subtask_id
-            })
+            logger.info(f"Workflow finished for task {task_id}")
             
-            # Assign to agent
-            session.run("""
-                MATCH (agent:Agent {id: $agent_id})
-                MATCH (subtask:SubTask {id: $subtask_id})
-                MERGE (agent)-[:ASSIGNED_TO]->(subtask)
-            """, {
-                "agent_id": f"{agent_type}_agent",
-                "subtask_id": subtask_id
-            })
-        
-        # Send task to agent via HTTP
-        await self._send_task_to_agent(agent_type, subtask_id, task_type, parameters)
-        
-        return subtask_id
+        except Exception as e:
+            logger.error(f"Error running workflow for task {task_id}: {e}")
+            with self.driver.session() as session:
+                session.execute_write(lambda tx: tx.run("""
+                    MATCH (task:Task {id: $task_id})
+                    SET task.status = 'failed'
+                """, {"task_id": task_id}).consume())
+    
+    def _create_subtasks_batch(self, rows: List[Dict]):
+        """Create subtasks, link them to their task and assign them to agents in one write."""
+        with self.driver.session() as session:
+            session.execute_write(lambda tx: tx.run(CYPHER_ASSIGN_SUBTASK_BATCH, {"rows": rows}).consume())
     
     async def _send_task_to_agent(self, agent_type: str, subtask_id: str, 
                                  task_type: str, parameters: Dict):
@@ -300,94 +365,85 @@ class Orchestrator:
             }
         
         try:
-            response = requests.post(agent_url, json=payload, timeout=120)  # Increased timeout to 120 seconds
+            async with self._dispatch_sem:
+                response = await self.http.post(
+                    agent_url,
+                    content=orjson.dumps(payload),
+                    headers={"Content-Type": "application/json"}
+                )
             response.raise_for_status()
             logger.info(f"Task {subtask_id} sent to {agent_type} agent")
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error sending task to {agent_type} agent: {e}")
             raise
     
     def get_agent_status(self) -> List[AgentStatus]:
         """Get status of all agents."""
-        status_list = []
-        
         with self.driver.session() as session:
-            result = session.run("""
-                MATCH (a:Agent)
-                RETURN a.agent_id as id, a.agent_type as type, a.status as status, 
-                       a.current_task as current_task, a.capabilities as capabilities
-            """)
-            
-            for record in result:
-                # Handle null values and provide defaults
-                agent_id = record["id"] or "unknown"
-                agent_type = record["type"] or "unknown"
-                status = record["status"] or "unknown"
-                current_task = record["current_task"] or ""
-                capabilities = record["capabilities"] or []
-                
-                # Ensure capabilities is a list
-                if not isinstance(capabilities, list):
-                    capabilities = []
-                
-                status_list.append(AgentStatus(
-                    agent_id=agent_id,
-                    agent_type=agent_type,
-                    status=status,
-                    current_task=current_task,
-                    capabilities=capabilities
-                ))
+            records = session.execute_read(
+                lambda tx: [record.data() for record in tx.run(CYPHER_AGENT_STATUS)]
+            )
         
-        return status_list
+        return [AgentStatus(**record) for record in records]
     
     def get_task_status(self, task_id: str) -> Dict:
         """Get status of a specific task."""
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (task:Task {id: $task_id})
-                OPTIONAL MATCH (task)-[:CONTAINS]->(subtask:SubTask)
-                RETURN task, collect(subtask) as subtasks
-            """, {"task_id": task_id})
-            
-            record = result.single()
-            if not record:
-                raise HTTPException(status_code=404, detail="Task not found")
-            
-            task = record["task"]
-            subtasks = record["subtasks"]
-            
-            return {
-                "task_id": task["id"],
-                "status": task["status"],
-                "type": task["type"],
-                "created_at": task["created_at"],
-                "subtasks": [
-                    {
-                        "id": st["id"],
-                        "type": st["type"],
-                        "status": st["status"]
-                    } for st in subtasks if st is not None
-                ]
-            }
+        # One row per subtask with scalar columns only, streamed as it arrives
+        # instead of collected into a single list of full nodes
+        def read(tx):
+            task = None
+            for record in tx.run(CYPHER_TASK_STATUS, {"task_id": task_id}):
+                if task is None:
+                    task = {
+                        "task_id": record["id"],
+                        "status": record["status"],
+                        "type": record["type"],
+                        "created_at": record["created_at"],
+                        "subtasks": []
+                    }
+                if record["subtask_id"] is not None:
+                    task["subtasks"].append({
+                        "id": record["subtask_id"],
+                        "type": record["subtask_type"],
+                        "status": record["subtask_status"]
+                    })
+            return task
+        
+        with self.driver.session(fetch_size=1000) as session:
+            task = session.execute_read(read)
+        
+        if task is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        
+        return task
 
 # FastAPI app
 app = FastAPI(title="Marketing Analysis Orchestrator", version="1.0.0")
-orchestrator = Orchestrator()
+
+@app.on_event("startup")
+def startup():
+    """Connect once per worker; every request shares this driver's pool."""
+    app.state.orchestrator = Orchestrator()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the shared HTTP client and Neo4j driver."""
+    await app.state.orchestrator.close()
 
 @app.post("/task", response_model=TaskResponse)
 async def create_task(task_request: TaskRequest):
     """Create a new marketing analysis task."""
-    return await orchestrator.create_task(task_request)
+    return await app.state.orchestrator.create_task(task_request)
 
 @app.get("/agents", response_model=List[AgentStatus])
 async def get_agents():
     """Get status of all agents."""
-    return orchestrator.get_agent_status()
+    return app.state.orchestrator.get_agent_status()
 
 @app.get("/task/{task_id}")
 async def get_task_status(task_id: str):
     """Get status of a specific task."""
-    return orchestrator.get_task_status(task_id)
+    return app.state.orchestrator.get_task_status(task_id)
 
 @app.get("/health")
 async def health_check():
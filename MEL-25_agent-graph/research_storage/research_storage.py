@@ -4,18 +4,28 @@ Research Storage Service for Marketing Analysis Strategy Department
 Stores and manages research results, findings, and data for paper generation.
 """
 
-import os
+import itertools
 import json
+import os
 import logging
+import re
+import stat
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import HTMLResponse, FileResponse
+from cachetools import LRUCache
+from fastapi import FastAPI, Header, HTTPException, UploadFile, File
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
+import orjson
 import uvicorn
 
 # Set up logging
@@ -23,6 +33,8 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Research Storage Service", version="1.0.0")
+# Data listings and exports are large, repetitive JSON
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 # Create directories
 DATA_DIR = Path("/app/data")
@@ -34,6 +46,270 @@ REPORTS_DIR.mkdir(exist_ok=True)
 # app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+# Path -> ((mtime_ns, size), parsed data); a file is only re-parsed once it changes
+_parse_cache = LRUCache(maxsize=1024)
+# File endpoints are plain def handlers run on FastAPI's threadpool, so the
+# parse cache and the index cache are guarded by this lock
+_cache_lock = threading.Lock()
+
+# {"cached": (index snapshot, stats)} from the last /api/stats call. Index snapshots are
+# immutable and replaced on any change, so stats are reused while the same one is current.
+_stats_cache: Dict[str, Any] = {}
+
+_LONG_DIGITS = re.compile(rb"\d{20}")
+
+def _load_json(filepath: Path) -> Dict[str, Any]:
+    """Read and parse one stored JSON file, reusing the last parse while it is unchanged.
+    
+    The parsed dict is shared with later callers, so it must not be mutated.
+    """
+    st = filepath.stat()
+    version = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _parse_cache.get(filepath)
+    if cached and cached[0] == version:
+        return cached[1]
+    
+    data = _parse_json(filepath.read_bytes())
+    with _cache_lock:
+        _parse_cache[filepath] = (version, data)
+    return data
+
+def _parse_json(raw: bytes) -> Any:
+    """Parse stored JSON bytes."""
+    # orjson reads integers beyond 64 bits as floats; any such integer has 20+ digits
+    return json.loads(raw) if _LONG_DIGITS.search(raw) else orjson.loads(raw)
+
+def _read_valid_json(filepath: Path) -> bytes:
+    """Return the raw bytes of a stored JSON file, raising ValueError if they do not parse.
+    
+    Bytes whose (mtime, size) matches a cached parse are not parsed again.
+    """
+    with open(filepath, "rb") as f:
+        raw = f.read()
+        st = os.fstat(f.fileno())
+    version = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _parse_cache.get(filepath)
+    if not (cached and cached[0] == version and len(raw) == st.st_size):
+        data = _parse_json(raw)
+        if len(raw) == st.st_size:
+            with _cache_lock:
+                _parse_cache[filepath] = (version, data)
+    return raw
+
+# Overlaps the reads and parses of whole-directory passes (index rebuild, LaTeX export).
+# Created on startup and shut down on shutdown, so each app lifespan gets a live pool.
+_io_pool: Optional[ThreadPoolExecutor] = None
+
+def _try_load_json(filepath: Path) -> Optional[Dict[str, Any]]:
+    """Like _load_json, but log and return None for an unreadable file."""
+    try:
+        return _load_json(filepath)
+    except Exception as e:
+        logger.warning(f"Error reading file {filepath}: {e}")
+        return None
+
+def _load_many(filepaths: List[Path]) -> List[Optional[Dict[str, Any]]]:
+    """Load files in parallel on the IO pool, in input order; None marks an unreadable file."""
+    pool = _io_pool
+    if pool is None:
+        # Outside a lifespan, e.g. while shutting down
+        return [_try_load_json(filepath) for filepath in filepaths]
+    return list(pool.map(_try_load_json, filepaths))
+
+def _write_json(filepath: Path, data: Any):
+    """Write data to filepath as indented UTF-8 JSON."""
+    try:
+        encoded = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    except orjson.JSONEncodeError:
+        # orjson rejects integers beyond 64 bits, which the json module writes exactly
+        encoded = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    filepath.write_bytes(encoded)
+
+# One JSON line per stored file with the fields queries filter on, so filtering and
+# stats read this file instead of opening every data file. Rebuilt from the data files
+# at startup and whenever it goes missing or shrinks, appended to on every store and for
+# data files found on disk that it does not list; the .jsonl suffix keeps it out of
+# "*.json" scans.
+INDEX_FILE = DATA_DIR / "_index.jsonl"
+INDEX_FIELDS = ("agent_id", "task_id", "data_type", "timestamp")
+
+# {"size": bytes of INDEX_FILE consumed, "entries": filename -> index entry,
+#  "dir_mtime": DATA_DIR mtime when entries were last checked against the files on disk,
+#  "snapshot": tuple of the entries, oldest first, handed out to readers}
+_index_cache: Dict[str, Any] = {}
+# Serializes writes to INDEX_FILE, so a store cannot append to an index a rebuild is replacing
+_index_write_lock = threading.Lock()
+
+def _index_line(filename: str, data: Dict[str, Any]) -> bytes:
+    """Serialize the index entry for one stored file."""
+    entry = {field: data.get(field) for field in INDEX_FIELDS}
+    entry["filename"] = filename
+    return orjson.dumps(entry) + b"\n"
+
+def _rebuild_index():
+    """Rewrite the index from the data files currently on disk."""
+    # Held from the scan to the replace: a store that writes its file after the scan
+    # appends its line to the new index, never to the file being replaced
+    with _index_write_lock:
+        with os.scandir(DATA_DIR) as entries:
+            data_files = sorted(
+                (entry for entry in entries if entry.name.endswith(".json") and entry.is_file()),
+                key=lambda entry: entry.stat().st_mtime_ns
+            )
+        
+        loaded = _load_many([Path(entry.path) for entry in data_files])
+        lines = [
+            _index_line(entry.name, data)
+            for entry, data in zip(data_files, loaded)
+            if isinstance(data, dict)
+        ]
+        
+        tmp_file = INDEX_FILE.with_suffix(".tmp")
+        tmp_file.write_bytes(b"".join(lines))
+        tmp_file.replace(INDEX_FILE)
+        with _cache_lock:
+            _index_cache.clear()
+
+def _adopt_files(filenames: List[str]):
+    """Append index lines for data files that reached DATA_DIR without going through a store."""
+    filepaths = sorted((DATA_DIR / name for name in filenames), key=_mtime_or_zero)
+    lines = [
+        _index_line(filepath.name, data)
+        for filepath, data in zip(filepaths, _load_many(filepaths))
+        if isinstance(data, dict)
+    ]
+    if lines:
+        with _index_write_lock, open(INDEX_FILE, "ab") as f:
+            f.write(b"".join(lines))
+
+def _mtime_or_zero(filepath: Path) -> int:
+    """Modification time of filepath in ns, or 0 if it has gone."""
+    try:
+        return filepath.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def _refresh_index() -> Tuple[Optional[Tuple[Dict[str, Any], ...]], List[str]]:
+    """Bring the cached index up to date.
+    
+    Returns the snapshot (None if the index file is missing or was rewritten) and the
+    data files on disk that the index does not list.
+    """
+    with _cache_lock:
+        offset = _index_cache.get("size", 0)
+        # Read before the index so a change racing with this call is seen next time
+        dir_mtime = DATA_DIR.stat().st_mtime_ns
+        try:
+            size = INDEX_FILE.stat().st_size
+        except FileNotFoundError:
+            return None, []
+        if size < offset:
+            return None, []
+        if (size == offset and dir_mtime == _index_cache.get("dir_mtime")
+                and "snapshot" in _index_cache):
+            return _index_cache["snapshot"], []
+        
+        entries = _index_cache.setdefault("entries", {})
+        if size > offset:
+            try:
+                with open(INDEX_FILE, "rb") as f:
+                    f.seek(offset)
+                    appended = f.read()
+            except FileNotFoundError:
+                return None, []
+            # Leave a line that is still being written for the next call
+            end = appended.rfind(b"\n") + 1
+            for line in appended[:end].splitlines():
+                entry = orjson.loads(line)
+                # A re-stored filename moves to the end, like a new file
+                entries.pop(entry["filename"], None)
+                entries[entry["filename"]] = entry
+            _index_cache["size"] = offset + end
+        
+        # Adding or deleting a data file changes the directory's mtime; reconcile the
+        # entries with the files actually on disk
+        unindexed = []
+        if dir_mtime != _index_cache.get("dir_mtime"):
+            on_disk = {name for name in os.listdir(DATA_DIR) if name.endswith(".json")}
+            for filename in [name for name in entries if name not in on_disk]:
+                del entries[filename]
+            unindexed = [name for name in on_disk if name not in entries]
+            _index_cache["dir_mtime"] = dir_mtime
+        
+        _index_cache["snapshot"] = tuple(entries.values())
+        return _index_cache["snapshot"], unindexed
+
+def _read_index() -> Tuple[Dict[str, Any], ...]:
+    """Return the index entries for files on disk, oldest first, parsing only lines appended since the last call."""
+    snapshot, unindexed = _refresh_index()
+    if snapshot is None:
+        logger.warning(f"Index file {INDEX_FILE} is missing or was rewritten; rebuilding it")
+        _rebuild_index()
+        snapshot, unindexed = _refresh_index()
+    if unindexed:
+        # Loaded outside _cache_lock, which _load_json takes; a store still between
+        # writing its file and appending its line is re-added harmlessly by that line
+        _adopt_files(unindexed)
+        snapshot, _ = _refresh_index()
+    return snapshot or ()
+
+@app.on_event("startup")
+def startup():
+    """Start the IO pool, then index the data files already on disk, including any changed while the service was down."""
+    global _io_pool
+    _io_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="research_io")
+    _rebuild_index()
+
+@app.on_event("shutdown")
+def shutdown():
+    """Stop the IO pool's worker threads."""
+    global _io_pool
+    pool, _io_pool = _io_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# Fixed opening of the LaTeX export
+LATEX_PREAMBLE = "\n".join([
+    "\\documentclass{article}",
+    "\\usepackage[utf8]{inputenc}",
+    "\\usepackage{graphicx}",
+    "\\usepackage{hyperref}",
+    "\\title{Marketing Analysis Research Report}",
+    "\\author{Marketing Analysis Strategy Department}",
+    "\\date{\\today}",
+    "\\begin{document}",
+    "\\maketitle"
+])
+
+LATEX_ITEM_HEADER = (
+    "\\subsection{{{agent}}}\n"
+    "\\textbf{{Task ID:}} {task}\n"
+    "\\textbf{{Timestamp:}} {timestamp}"
+)
+
+# Characters LaTeX treats as markup, mapped to their literal forms
+_LATEX_ESCAPES = str.maketrans({
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}"
+})
+
+def _latex_escape(value: Any) -> str:
+    """Render value as LaTeX text with special characters escaped."""
+    return str(value).translate(_LATEX_ESCAPES)
+
+# Appended to data filenames so stores in the same nanosecond still get distinct files
+_store_counter = itertools.count()
+
 # Pydantic models
 class ResearchData(BaseModel):
     agent_id: str
@@ -49,101 +325,104 @@ class ResearchQuery(BaseModel):
     task_id: Optional[str] = None
     limit: int = 100
 
-@app.get("/", response_class=HTMLResponse)
-async def home():
-    """Research storage dashboard."""
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Research Storage Dashboard</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 40px; }
-            .container { max-width: 1200px; margin: 0 auto; }
-            .section { margin: 20px 0; padding: 20px; border: 1px solid #ddd; border-radius: 8px; }
-            .btn { padding: 10px 20px; margin: 5px; text-decoration: none; color: white; border-radius: 5px; }
-            .btn-primary { background: #007bff; }
-            .btn-secondary { background: #6c757d; }
-            .stats { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; }
-            .stat-card { background: #f8f9fa; padding: 20px; border-radius: 8px; text-align: center; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>📚 Research Storage Dashboard</h1>
-            
-            <div class="section">
-                <h2>📊 Quick Stats</h2>
-                <div class="stats">
-                    <div class="stat-card">
-                        <h3>Total Research Items</h3>
-                        <p id="total-items">Loading...</p>
-                    </div>
-                    <div class="stat-card">
-                        <h3>Scraped Data</h3>
-                        <p id="scraped-data">Loading...</p>
-                    </div>
-                    <div class="stat-card">
-                        <h3>Analysis Results</h3>
-                        <p id="analysis-results">Loading...</p>
-                    </div>
-                    <div class="stat-card">
-                        <h3>Reports Generated</h3>
-                        <p id="reports">Loading...</p>
-                    </div>
+# Static dashboard page, encoded once; its stats are fetched client-side from /api/stats
+DASHBOARD_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Research Storage Dashboard</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 40px; }
+        .container { max-width: 1200px; margin: 0 auto; }
+        .section { margin: 20px 0; padding: 20px; border: 1px solid #ddd; border-radius: 8px; }
+        .btn { padding: 10px 20px; margin: 5px; text-decoration: none; color: white; border-radius: 5px; }
+        .btn-primary { background: #007bff; }
+        .btn-secondary { background: #6c757d; }
+        .stats { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; }
+        .stat-card { background: #f8f9fa; padding: 20px; border-radius: 8px; text-align: center; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>📚 Research Storage Dashboard</h1>
+        
+        <div class="section">
+            <h2>📊 Quick Stats</h2>
+            <div class="stats">
+                <div class="stat-card">
+                    <h3>Total Research Items</h3>
+                    <p id="total-items">Loading...</p>
+                </div>
+                <div class="stat-card">
+                    <h3>Scraped Data</h3>
+                    <p id="scraped-data">Loading...</p>
+                </div>
+                <div class="stat-card">
+                    <h3>Analysis Results</h3>
+                    <p id="analysis-results">Loading...</p>
+                </div>
+                <div class="stat-card">
+                    <h3>Reports Generated</h3>
+                    <p id="reports">Loading...</p>
                 </div>
-            </div>
-            
-            <div class="section">
-                <h2>🔍 Research Data</h2>
-                <a href="/api/data" class="btn btn-primary">View All Data</a>
-                <a href="/api/data?data_type=scraped_data" class="btn btn-secondary">Scraped Data</a>
-                <a href="/api/data?data_type=analysis_results" class="btn btn-secondary">Analysis Results</a>
-                <a href="/api/data?data_type=strategy_insights" class="btn btn-secondary">Strategy Insights</a>
-                <a href="/api/data?data_type=report_sections" class="btn btn-secondary">Report Sections</a>
-            </div>
-            
-            <div class="section">
-                <h2>📄 Reports</h2>
-                <a href="/reports" class="btn btn-primary">View Reports</a>
-                <a href="/api/export/latex" class="btn btn-secondary">Export LaTeX</a>
-                <a href="/api/export/json" class="btn btn-secondary">Export JSON</a>
-            </div>
-            
-            <div class="section">
-                <h2>🔧 API Endpoints</h2>
-                <ul>
-                    <li><strong>GET /api/data</strong> - Get all research data</li>
-                    <li><strong>POST /api/data</strong> - Store new research data</li>
-                    <li><strong>GET /api/data/{data_type}</strong> - Get data by type</li>
-                    <li><strong>GET /api/export/latex</strong> - Export LaTeX report</li>
-                    <li><strong>GET /api/export/json</strong> - Export JSON data</li>
-                </ul>
             </div>
         </div>
         
-        <script>
-            // Load stats
-            fetch('/api/stats')
-                .then(response => response.json())
-                .then(data => {
-                    document.getElementById('total-items').textContent = data.total_items;
-                    document.getElementById('scraped-data').textContent = data.scraped_data;
-                    document.getElementById('analysis-results').textContent = data.analysis_results;
-                    document.getElementById('reports').textContent = data.reports;
-                });
-        </script>
-    </body>
-    </html>
-    """
+        <div class="section">
+            <h2>🔍 Research Data</h2>
+            <a href="/api/data" class="btn btn-primary">View All Data</a>
+            <a href="/api/data?data_type=scraped_data" class="btn btn-secondary">Scraped Data</a>
+            <a href="/api/data?data_type=analysis_results" class="btn btn-secondary">Analysis Results</a>
+            <a href="/api/data?data_type=strategy_insights" class="btn btn-secondary">Strategy Insights</a>
+            <a href="/api/data?data_type=report_sections" class="btn btn-secondary">Report Sections</a>
+        </div>
+        
+        <div class="section">
+            <h2>📄 Reports</h2>
+            <a href="/reports" class="btn btn-primary">View Reports</a>
+            <a href="/api/export/latex" class="btn btn-secondary">Export LaTeX</a>
+            <a href="/api/export/json" class="btn btn-secondary">Export JSON</a>
+        </div>
+        
+        <div class="section">
+            <h2>🔧 API Endpoints</h2>
+            <ul>
+                <li><strong>GET /api/data</strong> - Get all research data</li>
+                <li><strong>POST /api/data</strong> - Store new research data</li>
+                <li><strong>GET /api/data/{data_type}</strong> - Get data by type</li>
+                <li><strong>GET /api/export/latex</strong> - Export LaTeX report</li>
+                <li><strong>GET /api/export/json</strong> - Export JSON data</li>
+            </ul>
+        </div>
+    </div>
+    
+    <script>
+        // Load stats
+        fetch('/api/stats')
+            .then(response => response.json())
+            .then(data => {
+                document.getElementById('total-items').textContent = data.total_items;
+                document.getElementById('scraped-data').textContent = data.scraped_data;
+                document.getElementById('analysis-results').textContent = data.analysis_results;
+                document.getElementById('reports').textContent = data.reports;
+            });
+    </script>
+</body>
+</html>
+""".encode("utf-8")
+
+@app.get("/", response_class=HTMLResponse)
+async def home():
+    """Research storage dashboard."""
+    return HTMLResponse(content=DASHBOARD_HTML)
 
 @app.post("/api/data")
-async def store_research_data(data: ResearchData):
+def store_research_data(data: ResearchData):
     """Store research data from agents."""
     try:
-        # Create filename based on data type and timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{data.data_type}_{data.agent_id}_{timestamp}.json"
+        # Unique per store; a seconds timestamp let concurrent stores overwrite each other
+        now_ns = time.time_ns()
+        filename = f"{data.data_type}_{data.agent_id}_{now_ns}_{next(_store_counter)}.json"
         filepath = DATA_DIR / filename
         
         # Prepare data for storage
@@ -154,14 +433,16 @@ async def store_research_data(data: ResearchData):
             "content": data.content,
             "timestamp": data.timestamp,
             "metadata": data.metadata or {},
-            "stored_at": datetime.now().isoformat()
+            "stored_at": datetime.fromtimestamp(now_ns / 1e9).isoformat()
         }
         
         # Save to file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(storage_data, f, indent=2, ensure_ascii=False)
+        _write_json(filepath, storage_data)
+        with _index_write_lock, open(INDEX_FILE, "ab") as f:
+            f.write(_index_line(filename, storage_data))
         
-        logger.info(f"Stored research data: {filename}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Stored research data: {filename}")
         return {"status": "success", "filename": filename, "message": "Research data stored successfully"}
     
     except Exception as e:
@@ -169,31 +450,38 @@ async def store_research_data(data: ResearchData):
         raise HTTPException(status_code=500, detail=f"Failed to store research data: {str(e)}")
 
 @app.get("/api/data")
-async def get_research_data(
+def get_research_data(
     data_type: Optional[str] = None,
     agent_id: Optional[str] = None,
     task_id: Optional[str] = None,
-    limit: int = 100
+    limit: int = 100,
+    include_content: bool = True
 ):
-    """Retrieve research data with optional filtering."""
+    """Retrieve research data with optional filtering, newest first.
+    
+    With include_content=false only the index fields of each item are
+    returned and no data files are opened.
+    """
     try:
-        data_files = list(DATA_DIR.glob("*.json"))
         results = []
         
-        for filepath in data_files[:limit]:
+        # Filter on the index, then open only the files that will be returned
+        for entry in reversed(_read_index()):
+            if len(results) >= limit:
+                break
+            if data_type and entry['data_type'] != data_type:
+                continue
+            if agent_id and entry['agent_id'] != agent_id:
+                continue
+            if task_id and entry['task_id'] != task_id:
+                continue
+            if not include_content:
+                results.append(entry)
+                continue
+            
+            filepath = DATA_DIR / entry['filename']
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # Apply filters
-                if data_type and data.get('data_type') != data_type:
-                    continue
-                if agent_id and data.get('agent_id') != agent_id:
-                    continue
-                if task_id and data.get('task_id') != task_id:
-                    continue
-                
-                results.append(data)
+                results.append(_load_json(filepath))
             except Exception as e:
                 logger.warning(f"Error reading file {filepath}: {e}")
                 continue
@@ -209,29 +497,26 @@ async def get_research_data(
         raise HTTPException(status_code=500, detail=f"Failed to retrieve research data: {str(e)}")
 
 @app.get("/api/stats")
-async def get_stats():
+def get_stats():
     """Get research storage statistics."""
     try:
-        data_files = list(DATA_DIR.glob("*.json"))
+        entries = _read_index()
+        cached = _stats_cache.get("cached")
+        if cached and cached[0] is entries:
+            return cached[1]
+        
+        type_counts = Counter(entry['data_type'] for entry in entries)
         
         stats = {
-            "total_items": len(data_files),
-            "scraped_data": 0,
-            "analysis_results": 0,
-            "strategy_insights": 0,
-            "report_sections": 0
+            "total_items": len(entries),
+            "scraped_data": type_counts["scraped_data"],
+            "analysis_results": type_counts["analysis_results"],
+            "strategy_insights": type_counts["strategy_insights"],
+            "report_sections": type_counts["report_sections"]
         }
         
-        for filepath in data_files:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    data_type = data.get('data_type', 'unknown')
-                    if data_type in stats:
-                        stats[data_type] += 1
-            except:
-                continue
-        
+        # One assignment, so a concurrent reader never pairs a snapshot with other stats
+        _stats_cache["cached"] = (entries, stats)
         return stats
     
     except Exception as e:
@@ -239,50 +524,39 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
 @app.get("/api/export/latex")
-async def export_latex():
+def export_latex():
     """Export research data as LaTeX report."""
     try:
-        data_files = list(DATA_DIR.glob("*.json"))
-        
-        latex_content = []
-        latex_content.append("\\documentclass{article}")
-        latex_content.append("\\usepackage[utf8]{inputenc}")
-        latex_content.append("\\usepackage{graphicx}")
-        latex_content.append("\\usepackage{hyperref}")
-        latex_content.append("\\title{Marketing Analysis Research Report}")
-        latex_content.append("\\author{Marketing Analysis Strategy Department}")
-        latex_content.append("\\date{\\today}")
-        latex_content.append("\\begin{document}")
-        latex_content.append("\\maketitle")
-        
         # Group data by type
         data_by_type = {}
-        for filepath in data_files:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    data_type = data.get('data_type', 'unknown')
-                    if data_type not in data_by_type:
-                        data_by_type[data_type] = []
-                    data_by_type[data_type].append(data)
-            except:
+        for data in _load_many([DATA_DIR / entry['filename'] for entry in _read_index()]):
+            if not isinstance(data, dict):
                 continue
+            data_type = data.get('data_type', 'unknown')
+            if data_type not in data_by_type:
+                data_by_type[data_type] = []
+            data_by_type[data_type].append(data)
         
         # Generate sections for each data type
+        latex_content = [LATEX_PREAMBLE]
         for data_type, items in data_by_type.items():
-            latex_content.append(f"\\section{{{data_type.replace('_', ' ').title()}}}")
+            latex_content.append(f"\\section{{{_latex_escape(data_type.replace('_', ' ').title())}}}")
             
             for item in items:
-                latex_content.append(f"\\subsection{{{item.get('agent_id', 'Unknown Agent')}}}")
-                latex_content.append(f"\\textbf{{Task ID:}} {item.get('task_id', 'Unknown')}")
-                latex_content.append(f"\\textbf{{Timestamp:}} {item.get('timestamp', 'Unknown')}")
+                latex_content.append(LATEX_ITEM_HEADER.format(
+                    agent=_latex_escape(item.get('agent_id', 'Unknown Agent')),
+                    task=_latex_escape(item.get('task_id', 'Unknown')),
+                    timestamp=_latex_escape(item.get('timestamp', 'Unknown'))
+                ))
                 
                 content = item.get('content', {})
                 if isinstance(content, dict):
-                    for key, value in content.items():
-                        latex_content.append(f"\\textbf{{{key}}}: {value}")
+                    latex_content.extend(
+                        f"\\textbf{{{_latex_escape(key)}}}: {_latex_escape(value)}"
+                        for key, value in content.items()
+                    )
                 else:
-                    latex_content.append(f"\\textbf{{Content}}: {content}")
+                    latex_content.append(f"\\textbf{{Content}}: {_latex_escape(content)}")
                 
                 latex_content.append("")
         
@@ -304,29 +578,32 @@ async def export_latex():
         raise HTTPException(status_code=500, detail=f"Failed to export LaTeX: {str(e)}")
 
 @app.get("/api/export/json")
-async def export_json():
-    """Export all research data as JSON."""
+def export_json():
+    """Export all research data as a JSON array, streamed one stored item at a time."""
     try:
-        data_files = list(DATA_DIR.glob("*.json"))
-        all_data = []
-        
-        for filepath in data_files:
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    all_data.append(data)
-            except:
-                continue
+        entries = _read_index()
         
-        # Save JSON export
-        json_file = REPORTS_DIR / f"research_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(all_data, f, indent=2, ensure_ascii=False)
+        def generate():
+            # Each stored file is already one JSON value, so once it is known to parse
+            # its bytes are copied into the array as-is instead of being re-encoded
+            yield b"["
+            first = True
+            for entry in entries:
+                filepath = DATA_DIR / entry['filename']
+                try:
+                    item = _read_valid_json(filepath).strip()
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Error reading file {filepath}: {e}")
+                    continue
+                yield item if first else b"," + item
+                first = False
+            yield b"]"
         
-        return FileResponse(
-            json_file,
+        filename = f"research_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        return StreamingResponse(
+            generate(),
             media_type='application/json',
-            filename=json_file.name
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
         )
     
     except Exception as e:
@@ -334,19 +611,23 @@ async def export_json():
         raise HTTPException(status_code=500, detail=f"Failed to export JSON: {str(e)}")
 
 @app.get("/reports")
-async def list_reports():
+def list_reports():
     """List available reports."""
     try:
-        report_files = list(REPORTS_DIR.glob("*"))
         reports = []
         
-        for filepath in report_files:
-            if filepath.is_file():
+        # DirEntry caches its file type from the directory listing, so each
+        # report costs one stat() call
+        with os.scandir(REPORTS_DIR) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
                 reports.append({
-                    "name": filepath.name,
-                    "size": filepath.stat().st_size,
-                    "modified": datetime.fromtimestamp(filepath.stat().st_mtime).isoformat(),
-                    "url": f"/reports/{filepath.name}"
+                    "name": entry.name,
+                    "size": st.st_size,
+                    "modified": datetime.fromtimestamp(st.st_mtime).isoformat(),
+                    "url": f"/reports/{entry.name}"
                 })
         
         return {"reports": reports}
@@ -355,16 +636,42 @@ async def list_reports():
         logger.error(f"Error listing reports: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to list reports: {str(e)}")
 
+def _etag_matches(if_none_match: str, opaque_tag: str) -> bool:
+    """Weak comparison of an If-None-Match list against one entity tag (RFC 9110 13.1.2)."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == opaque_tag
+        for tag in if_none_match.split(",")
+    )
+
 @app.get("/reports/{filename}")
-async def download_report(filename: str):
+def download_report(filename: str, if_none_match: Optional[str] = Header(None)):
     """Download a specific report."""
     try:
         filepath = REPORTS_DIR / filename
-        if not filepath.exists():
+        try:
+            st = filepath.stat()
+        except FileNotFoundError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
             raise HTTPException(status_code=404, detail="Report not found")
         
-        return FileResponse(filepath)
+        # Reports are never rewritten in place, so mtime and size identify the content.
+        # Weak, because GZipMiddleware may send a compressed representation under it.
+        opaque_tag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        headers = {
+            "ETag": f"W/{opaque_tag}",
+            "Cache-Control": "public, max-age=60"
+        }
+        if if_none_match and _etag_matches(if_none_match, opaque_tag):
+            return Response(status_code=304, headers=headers)
+        
+        # Handing over the stat result saves FileResponse its own stat() call
+        return FileResponse(filepath, stat_result=st, headers=headers)
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error downloading report: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to download report: {str(e)}")
@@ -375,4 +682,4 @@ async def health_check():
     return {"status": "healthy", "service": "research_storage"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8001, loop="uvloop", http="httptools") 
\ No newline at end of file
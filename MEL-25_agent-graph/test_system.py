@@ -7,6 +7,9 @@ import requests
 import json
 import time
 
+# Shared across the checks so they reuse one keep-alive connection
+session = requests.Session()
+
 def test_system():
     """Test the marketing analysis system."""
     base_url = "http://localhost:8000"
@@ -16,7 +19,7 @@ def test_system():
     # Test 1: Health check
     print("\n1. Testing health check...")
     try:
-        response = requests.get(f"{base_url}/health")
+        response = session.get(f"{base_url}/health")
         if response.status_code == 200:
             print("✅ Health check passed")
         else:
@@ -28,7 +31,7 @@ def test_system():
     # Test 2: Get agents
     print("\n2. Testing agents endpoint...")
     try:
-        response = requests.get(f"{base_url}/agents")
+        response = session.get(f"{base_url}/agents")
         if response.status_code == 200:
             agents = response.json()
             print(f"✅ Found {len(agents)} agents:")
@@ -50,7 +53,7 @@ def test_system():
             "priority": "high"
         }
         
-        response = requests.post(f"{base_url}/task", json=task_data)
+        response = session.post(f"{base_url}/task", json=task_data)
         if response.status_code == 200:
             result = response.json()
             task_id = result.get("task_id")
@@ -60,7 +63,7 @@ def test_system():
             print("\n4. Testing task status...")
             time.sleep(2)  # Wait a bit for task processing
             
-            response = requests.get(f"{base_url}/task/{task_id}")
+            response = session.get(f"{base_url}/task/{task_id}")
             if response.status_code == 200:
                 task_status = response.json()
                 print(f"✅ Task status retrieved:")
@@ -7,7 +7,7 @@ Simple web interface for monitoring and controlling the agent network.
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-import requests
+import httpx
 import os
 import logging
 
@@ -21,18 +21,25 @@ templates = Jinja2Templates(directory="templates")
 # Use Docker service name for orchestrator
 ORCHESTRATOR_URL = os.getenv("ORCHESTRATOR_URL", "http://orchestrator:8000")
 
+# One pooled client for the process, so dashboard renders reuse keep-alive connections
+orchestrator_client = httpx.AsyncClient(base_url=ORCHESTRATOR_URL, timeout=5.0)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the orchestrator client's connection pool."""
+    await orchestrator_client.aclose()
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Home page with system overview."""
     try:
         # Get agent status
-        logger.info(f"Fetching agents from {ORCHESTRATOR_URL}/agents")
-        response = requests.get(f"{ORCHESTRATOR_URL}/agents", timeout=5)
-        logger.info(f"Response status: {response.status_code}")
+        response = await orchestrator_client.get("/agents")
         
         if response.status_code == 200:
             agents = response.json()
-            logger.info(f"Retrieved {len(agents)} agents: {[agent.get('agent_id', 'unknown') for agent in agents]}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Retrieved {len(agents)} agents: {[agent.get('agent_id', 'unknown') for agent in agents]}")
         else:
             logger.error(f"Failed to get agents: {response.status_code}")
             agents = []
@@ -50,8 +57,6 @@ async def home(request: Request):
     
     system_status = "Online" if agents else "Offline"
     
-    logger.info(f"Rendering template with {len(agents)} agents, system_status: {system_status}")
-    
     return templates.TemplateResponse("index.html", {
         "request": request,
         "agents": agents,